@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+import asyncio
+import time
+import threading
+import traceback
+from PyQt5 import QtCore
+
+from pyqt5bar.profiling import profiler, source_name
+
+
+class AsyncLoopThread:
+    '''
+    One asyncio event loop running in a background thread, shared by
+    every async source of the process
+    '''
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name='pyqt5bar-asyncio',
+            daemon=True)
+        self.thread.start()
+
+    def submit(self, coro):
+        '''
+        Schedule coro on the loop, returns a concurrent.futures.Future
+        '''
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+def report_exception(future):
+    if not future.cancelled() and future.exception() is not None:
+        exc = future.exception()
+        traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def default_loop():
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = AsyncLoopThread()
+        return _loop_thread
+
+
+class AsyncFuncObject(QtCore.QObject):
+    '''
+    Runs an async def source on the shared loop every update_period
+    seconds, a run is skipped while the previous one is still pending
+    '''
+    update_signal = QtCore.pyqtSignal(object)
+
+    def __init__(self, func, update_period, post_proc_func, loop=None,
+                 triggers=(), timeout=None):
+        super().__init__()
+        self.func = func
+        self.update_period = update_period
+        self.post_proc_func = post_proc_func
+        self.loop = loop or default_loop()
+        self.timeout = timeout
+        self.name = source_name(func=func)
+        self.pending = None
+        self.changed = True
+        self.last_out = None
+        self.emitted_at = 0
+        self.last_run = time.monotonic()
+        self.triggers = list(triggers)
+
+    def watched_files(self):
+        return self.triggers
+
+    def file_ready(self, trigger):
+        return trigger.fire()
+
+    def run_once(self):
+        if self.pending is not None and not self.pending.done():
+            return
+        self.pending = self.loop.submit(self.run())
+        self.pending.add_done_callback(report_exception)
+
+    def emit_changed(self, out):
+        if self.post_proc_func is not None:
+            start = time.perf_counter()
+            out = self.post_proc_func(out)
+            profiler.record(self.name, 'post_proc', start)
+        self.last_run = time.monotonic()
+        self.changed = out != self.last_out
+        if self.changed:
+            self.last_out = out
+            self.emitted_at = time.perf_counter()
+            self.update_signal.emit(out)
+
+    async def run(self):
+        start = time.perf_counter()
+        out = await asyncio.wait_for(self.func(), self.timeout)
+        profiler.record(self.name, 'fetch', start)
+        self.emit_changed(out)
+
+    def stop(self):
+        if self.pending is not None:
+            self.pending.cancel()
+        for trigger in self.triggers:
+            trigger.close()
+
+    def cancel(self):
+        return self.pending is not None and self.pending.cancel()
+
+
+class AsyncStreamObject(AsyncFuncObject):
+    '''
+    Iterates an async generator source on the shared loop and emits
+    every value it yields, every update_period seconds the generator is
+    started again if it finished, it runs only once when that is 0
+    '''
+    async def run(self):
+        async for out in self.func():
+            self.emit_changed(out)
+
+
+async def command_output(*argv):
+    '''
+    stdout of argv, run without a shell
+    '''
+    proc = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE,
+        stdin=asyncio.subprocess.DEVNULL)
+    out, _ = await proc.communicate()
+    return out.decode()
+
+
+async def command_lines(*argv):
+    '''
+    Lines printed by a long running argv, as they come
+    '''
+    proc = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE,
+        stdin=asyncio.subprocess.DEVNULL)
+    try:
+        async for line in proc.stdout:
+            yield line.decode().rstrip('\n')
+    finally:
+        if proc.returncode is None:
+            proc.terminate()
+            await proc.wait()
+
+
+async def read_text(path):
+    '''
+    Content of path, read off the loop so slow files don't stall it
+    '''
+    def read():
+        with open(path) as f:
+            return f.read()
+    return await asyncio.to_thread(read)
+
+
+async def socket_lines(path):
+    '''
+    Lines received on the unix socket at path
+    '''
+    reader, writer = await asyncio.open_unix_connection(path)
+    try:
+        async for line in reader:
+            yield line.decode().rstrip('\n')
+    finally:
+        writer.close()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+'''
+Headless benchmark of a bar configuration
+
+    python -m pyqt5bar.benchmark --scenario synthetic --widgets 50
+    python -m pyqt5bar.benchmark --scenario example --json results.json
+
+Reports sustained updates per second, source to widget latency
+percentiles, thread count, process spawns per minute, wakeups per
+second and memory as JSON so runs can be compared between versions.
+'''
+
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import datetime
+import platform
+import threading
+import subprocess
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5 import QtWidgets, QtCore  # noqa: E402
+
+from pyqt5bar.main import Bar  # noqa: E402
+from pyqt5bar.bus import default_bus  # noqa: E402
+from pyqt5bar.compositor import default_compositor  # noqa: E402
+from pyqt5bar.widgets_base import SelfUpdatingWidget, TextWidget, GroupWidget  # noqa: E402
+
+
+class Recorder:
+    '''
+    Counts values reaching the GUI thread and, for synthetic widgets, the
+    latency from producing a value to the widget showing it
+    '''
+    def __init__(self):
+        self.updates = 0
+        self.latencies = []
+
+    def install(self, compositor):
+        post = compositor.post
+
+        def counting_post(widget, value):
+            self.updates += 1
+            post(widget, value)
+        compositor.post = counting_post
+
+    def record(self, produced):
+        self.latencies.append(time.perf_counter() - produced)
+
+    def percentile(self, p):
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+
+recorder = Recorder()
+
+
+class SyntheticWidget(SelfUpdatingWidget):
+    '''
+    Produces a new (sequence, timestamp) value every update_period
+    '''
+    def __init__(self, update_period, **kwargs):
+        self.seq = 0
+        super().__init__('', func=self.produce, update_period=update_period,
+                         **kwargs)
+
+    def produce(self):
+        self.seq += 1
+        return self.seq, time.perf_counter()
+
+    def update_widget(self, value):
+        seq, produced = value
+        super().update_widget(str(seq))
+        recorder.record(produced)
+
+
+def synthetic_scenario(args):
+    return [SyntheticWidget(args.period) for _ in range(args.widgets)]
+
+
+def sysstats_scenario(args):
+    '''
+    Builtin widgets that only read /proc and /sys
+    '''
+    from pyqt5bar.builtin_widgets import (
+        RamUsageWidget, CpuTempWidget, CpuUsageWidget, BatteryWidget)
+    default_bus().define('clock', func=lambda: datetime.datetime.now().strftime(
+        '%a, %d-%b-%Y / %I:%M:%S'), update_period=1)
+    return [
+        RamUsageWidget(), CpuTempWidget(update_period=5), CpuUsageWidget(),
+        BatteryWidget(), 'Stretch', SelfUpdatingWidget('', source='clock')]
+
+
+def example_scenario(args):
+    '''
+    The widgets of example.py, external commands it relies on count as
+    spawns even when they are missing
+    '''
+    from pyqt5bar.builtin_widgets import (
+        RamUsageWidget, CpuTempWidget, CpuUsageWidget, BatteryWidget,
+        HerbstluftwmTagsWidget, VolumeWidget, corona_cases)
+    default_bus().define('clock', func=lambda: datetime.datetime.now().strftime(
+        '%a, %d-%b-%Y / %I:%M:%S'), update_period=1)
+    return [
+        HerbstluftwmTagsWidget(),
+        GroupWidget([TextWidget('🦠'), SelfUpdatingWidget(
+            '0', None, corona_cases, 3600)]),
+        SelfUpdatingWidget('US', 'xkb-switch', None, 600, 'xkb-switch -W',
+                           lambda x: f'{x.upper()[0:2]}'),
+        VolumeWidget(),
+        'Stretch',
+        GroupWidget([
+            TextWidget('SysStats:'), RamUsageWidget(),
+            CpuTempWidget(update_period=5),
+            GroupWidget([TextWidget('\U0001F4BB'), CpuUsageWidget()]),
+            BatteryWidget()]),
+        SelfUpdatingWidget('', source='clock'),
+    ]
+
+
+SCENARIOS = {
+    'synthetic': synthetic_scenario,
+    'sysstats': sysstats_scenario,
+    'example': example_scenario,
+}
+
+
+class SpawnCounter:
+    '''
+    Counts processes started through subprocess, asyncio included
+    '''
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+        self.original_init = subprocess.Popen.__init__
+
+    def install(self):
+        counter = self
+
+        def init(popen, *args, **kwargs):
+            with counter.lock:
+                counter.count += 1
+            counter.original_init(popen, *args, **kwargs)
+        subprocess.Popen.__init__ = init
+
+
+def proc_status():
+    status = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, value = line.split(':', 1)
+            status[key] = value.strip()
+    return status
+
+
+def context_switches():
+    '''
+    Voluntary and involuntary context switches of every thread, each
+    one is a wakeup of the process
+    '''
+    total = 0
+    for status in glob.glob('/proc/self/task/*/status'):
+        try:
+            with open(status) as f:
+                for line in f:
+                    if 'ctxt_switches' in line:
+                        total += int(line.split()[1])
+        except FileNotFoundError:
+            # thread exited meanwhile
+            continue
+    return total
+
+
+def run(args):
+    spawns = SpawnCounter()
+    spawns.install()
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    recorder.install(default_compositor())
+
+    build_start = time.perf_counter()
+    bar = Bar(SCENARIOS[args.scenario](args), app)
+    bar.show()
+    build_time = time.perf_counter() - build_start
+
+    # let sources start before measuring, in the same event loop so
+    # nothing depends on the app quitting and running again
+    start = {}
+
+    def start_measuring():
+        recorder.updates, recorder.latencies = 0, []
+        start.update(spawns=spawns.count, switches=context_switches(),
+                     time=time.perf_counter())
+    QtCore.QTimer.singleShot(int(args.warmup * 1000), start_measuring)
+    QtCore.QTimer.singleShot(
+        int((args.warmup + args.duration) * 1000), app.quit)
+    app.exec_()
+    elapsed = time.perf_counter() - start['time']
+    status = proc_status()
+
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 3)
+
+    return {
+        'scenario': args.scenario,
+        'widgets': args.widgets if args.scenario == 'synthetic' else None,
+        'period': args.period if args.scenario == 'synthetic' else None,
+        'duration': round(elapsed, 3),
+        'python': platform.python_version(),
+        'qt': QtCore.QT_VERSION_STR,
+        'build_time_ms': ms(build_time),
+        'updates_per_second': round(recorder.updates / elapsed, 2),
+        'latency_ms': {
+            'p50': ms(recorder.percentile(50)),
+            'p90': ms(recorder.percentile(90)),
+            'p99': ms(recorder.percentile(99)),
+            'max': ms(max(recorder.latencies, default=None)),
+        },
+        'python_threads': threading.active_count(),
+        'os_threads': int(status['Threads']),
+        'spawns_per_minute': round(
+            (spawns.count - start['spawns']) * 60 / elapsed, 2),
+        'wakeups_per_second': round(
+            (context_switches() - start['switches']) / elapsed, 2),
+        'rss_kb': int(status['VmRSS'].split()[0]),
+        'peak_rss_kb': int(status['VmHWM'].split()[0]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Headless pyqt5bar benchmark')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='synthetic')
+    parser.add_argument('--widgets', type=int, default=20,
+                        help='number of synthetic widgets')
+    parser.add_argument('--period', type=float, default=0.1,
+                        help='update period of synthetic widgets')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds to measure')
+    parser.add_argument('--warmup', type=float, default=1,
+                        help='seconds to run before measuring')
+    parser.add_argument('--json', metavar='PATH',
+                        help='write the results to PATH instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,48 @@
 #!/usr/bin/env python
 
-import os
-import sys
-import requests
 import subprocess as sp
 from functools import partial
-from PyQt5 import QtWidgets, QtGui, QtCore, Qt
-from bs4 import BeautifulSoup
+from PyQt5 import QtWidgets, QtCore, Qt
+from pyqt5bar import metrics
+from pyqt5bar.bus import default_bus
+from pyqt5bar.cache import cached
+from pyqt5bar.graphs import GraphWidget
+from pyqt5bar.http_source import HttpFetcher
+from pyqt5bar.icons import icon_cache, image_path
+from pyqt5bar.styling import state_stylesheet, set_state
+from pyqt5bar.triggers import CommandTrigger, UeventTrigger
 from pyqt5bar.widgets_base import SelfUpdatingWidget, SelfUpdatingWidgets, TextWidget, GroupWidget, LabelWithSignals
 
-pathname = os.path.dirname(sys.argv[0])
-SCRIPT_PATH = os.path.abspath(pathname)
 
-SCRIPT_PATH = os.path.dirname(os.path.realpath(__file__))
+def main_counters(body, encoding):
+    '''
+    First span of every main counter of a worldometers page
+    '''
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(body, features='lxml')
+    return [div.span.text for div in soup.select(
+        "div[class='maincounter-number']") if div.span is not None]
+
+
+# parsing the page is heavy, it runs in the process pool
+corona_page = HttpFetcher(
+    'https://www.worldometers.info/coronavirus/country/iraq/',
+    parse=main_counters, executor='process', timeout=30)
 
+
+@cached('corona_cases', ttl=3600)
 def corona_cases():
+    cases = corona_page()
     try:
-        page = requests.get(
-                'https://www.worldometers.info/coronavirus/country/iraq/')
-        soup = BeautifulSoup(page.content, features='lxml')
-        cases = soup.select("div[class='maincounter-number']")
-        deaths_recovered = sum(float(c.span.text.replace(',', ''))
-                               for c in cases[1:])
-        total_cases = float(cases[0].span.text.replace(',', ''))
-        active_cases = total_cases - deaths_recovered
-        return f'{active_cases:0,.0f}'
-    except Exception:
+        total_cases, *deaths_recovered = (
+            float(c.replace(',', '')) for c in cases)
+    except (TypeError, ValueError):
         return
+    active_cases = total_cases - sum(deaths_recovered)
+    return f'{active_cases:0,.0f}'
 
 
+@cached('pacman_updates', ttl=3600)
 def pacman_updates():
     aur_packs = sp.check_output(
         'pikaur -Qua | tee /tmp/aurupdates | wc -l',
@@ -46,6 +60,34 @@ def cmd_output(cmd, **kwargs):
     except sp.CalledProcessError:
         return ''
 
+# herbstclient tag_status flags, see herbstluftwm(1)
+TAG_STATUS_FLAGS = {
+    '#': 'focused', '%': 'used', '+': 'used', '-': 'used',
+    ':': 'used', '!': 'urgent', '.': 'empty'}
+
+
+def parse_tag_status(output):
+    '''
+    Turn herbstclient tag_status output into a tuple of (name, state)
+    '''
+    return tuple(
+        (tag[1:], TAG_STATUS_FLAGS.get(tag[0], 'used'))
+        for tag in output.strip().split('\t') if tag)
+
+
+def herbstluftwm_source():
+    '''
+    Bus source of the tag states, every bar's tags widget shares one
+    herbstclient --idle and one tag_status per event
+    '''
+    name = 'herbstluftwm_tags'
+    default_bus().define(
+        name, cmd='herbstclient tag_status', update_period=5,
+        post_proc_func=parse_tag_status,
+        update_proc="herbstclient --idle 'focus_changed|tag_changed'")
+    return name
+
+
 class HerbstluftwmTagsWidget(SelfUpdatingWidgets):
     '''
     urgent_style  : tags with urgent windows stylesheet
@@ -65,26 +107,23 @@ class HerbstluftwmTagsWidget(SelfUpdatingWidgets):
             used_style={'background': 'transparent'},
             animate_urgent=True,
             **kwargs):
-        super().__init__(
-            [], None, self.tags_state, update_period=5, **kwargs,
-            update_proc="herbstclient --idle 'focus_changed|tag_changed'")
         self.urgent_style = urgent_style
         self.focused_style = focused_style
         self.empty_style = empty_style
         self.used_style = used_style
         self.animate_urgent = animate_urgent
-        self.org_tags_count = int(cmd_output('herbstclient attr tags.count'))
-        self.populate_group()
-
-    def populate_group(self):
-        if hasattr(self, 'widgets'):
-            for wdgt in self.widgets:
-                self.hlayout.removeWidget(wdgt)
-        tags_count = int(cmd_output('herbstclient attr tags.count'))
-        tags_names = [cmd_output(f'herbstclient attr tags.{i}.name')
-                      for i in range(tags_count)]
+        self.tags_stylesheet = state_stylesheet('tag_state', {
+            'focused': focused_style, 'urgent': urgent_style,
+            'empty': empty_style, 'used': used_style})
+        super().__init__([], source=herbstluftwm_source(), **kwargs)
+
+    def populate_group(self, tags_names):
+        for wdgt in self.widgets:
+            self.hlayout.removeWidget(wdgt)
+            wdgt.deleteLater()
         self.widgets = [LabelWithSignals(n) for n in tags_names]
         for wdgt in self.widgets:
+            wdgt.setStyleSheet(self.tags_stylesheet)
             wdgt.setMinimumWidth(20)
             wdgt.setAlignment(Qt.Qt.AlignCenter)
             self.hlayout.addWidget(wdgt)
@@ -104,185 +143,232 @@ class HerbstluftwmTagsWidget(SelfUpdatingWidgets):
         pass
 
     def update_widget(self, state):
-        focused, empty_tags, urgent_tags = state
-        for wdgt in self.widgets:
-            if wdgt.text() == focused:
-                wdgt.setStyleSheet('; '.join(
-                    f'{k}: {v}' for k, v in self.focused_style.items()))
-            elif wdgt.text() in urgent_tags:
-                wdgt.setStyleSheet('; '.join(
-                    f'{k}: {v}' for k, v in self.urgent_style.items()))
-                if self.animate_urgent:
-                    self.animate_urgent_wdgt(wdgt)
-            elif wdgt.text() in empty_tags:
-                wdgt.setStyleSheet('; '.join(
-                    f'{k}: {v}' for k, v in self.empty_style.items()))
-            else:
-                wdgt.setStyleSheet('; '.join(
-                    f'{k}: {v}' for k, v in self.used_style.items()))
- 
-    def tags_state(self):
-        tags_count = int(cmd_output('herbstclient attr tags.count'))
-        tags_names = [cmd_output(f'herbstclient attr tags.{i}.name')
-                      for i in range(tags_count)]
-        if tags_count != self.org_tags_count:
-            self.org_tags_count = tags_count
-            self.populate_group()
-
-        focused = cmd_output('herbstclient attr tags.focus.name')
-
-        empty_tags, urgent_tags = [], []
-        for desk in tags_names:
-            wins_count = cmd_output(
-                f"herbstclient attr tags.by-name.{desk}.client_count")
-            urgent_count = cmd_output(
-                f'herbstclient attr tags.by-name.{desk}.urgent_count')
-            urgent_count = 0 if urgent_count == '' else urgent_count
-            if int(wins_count) == 0:
-                empty_tags.append(desk)
-            if int(urgent_count) != 0:
-                urgent_tags.append(desk)
-        return focused, empty_tags, urgent_tags
-
-
-class VolumeWidget(GroupWidget):
+        '''
+        Restyle the tags whose state changed since the last snapshot
+        '''
+        tags_names = [name for name, _ in state]
+        if tags_names != [wdgt.text() for wdgt in self.widgets]:
+            self.populate_group(tags_names)
+        for wdgt, (name, tag_state) in zip(self.widgets, state):
+            if wdgt.property('tag_state') == tag_state:
+                continue
+            set_state(wdgt, 'tag_state', tag_state)
+            if tag_state == 'urgent' and self.animate_urgent:
+                self.animate_urgent_wdgt(wdgt)
+
+
+def volume_percent():
+    volume = cmd_output('pamixer --get-volume')
+    volume = volume if volume else '0'
+    return f'{int(volume):0>3.0f}%'
+
+
+def bus_source(name, func, update_period, triggers=None):
+    '''
+    Name of a shared data bus source sampling func every update_period,
+    widgets asking for the same func and period share it. triggers is a
+    callable building the source's triggers, called when it starts.
+    '''
+    name = f'{name}/{update_period}'
+    bus = default_bus()
+    if name not in bus.definitions:
+        bus.define(name, func=func, update_period=update_period,
+                   triggers=triggers or ())
+    return name
+
+
+def cpu_source(update_period):
+    '''
+    Bus source of CpuUsage samples, each period gets its own deltas
+    '''
+    return bus_source(
+        'cpu', partial(metrics.cpu_sampler.sample, update_period),
+        update_period)
+
+
+class VolumeWidget(SelfUpdatingWidgets):
     '''
     Battery percentage with papirus icons for panel
     '''
     def __init__(self, bar_height=20, **kwargs):
         self.volume_levels = {'none': 0, 'low': 25, 'medium': 50, 'high': 75}
+        self.bar_height = bar_height
         self.volume_icon = QtWidgets.QLabel()
         self.volume_icon.setStyleSheet('padding: 0px; background: transparent')
 
-        self.volume = SelfUpdatingWidget(
-            '100%', None, self.get_volume, 1, None, None,
+        self.volume = TextWidget(
+            '100%', stable_width='100%',
             click_func=partial(self.set_volume, '100%'),
             doubleclick_func=partial(self.set_volume, '0'),
             scrollup_func=partial(self.set_volume, '+2%'),
             scrolldown_func=partial(self.set_volume, '-2%'))
 
-        self.bar_height = bar_height
-        super().__init__([self.volume_icon, self.volume], **kwargs)
+        super().__init__(
+            [self.volume_icon, self.volume], source=bus_source(
+                'volume', volume_percent, 60, lambda: [CommandTrigger(
+                    'pactl subscribe', "'change' on sink")]),
+            **kwargs)
 
     def set_volume(self, vol):
         sp.Popen(f'pactl set-sink-volume @DEFAULT_SINK@ {vol}',
                  shell=True, text=True)
 
-    def get_volume(self):
-        volume = cmd_output('pamixer --get-volume')
-        volume = volume if volume else '0'
+    def update_widget(self, text):
+        self.volume.set_text(text)
+        volume = int(text.rstrip('%'))
         icon = [k for k, v in self.volume_levels.items()
-                if v >= int(volume) or v == 75][0]
+                if v >= volume or v == 75][0]
         icon = f'volume-level-{icon}-panel.svg'
-        if hasattr(self, 'prev_icon') and icon == self.prev_icon:
-            return f'{int(volume):0>3.0f}%'
+        if getattr(self, 'prev_icon', None) == icon:
+            return
         self.prev_icon = icon
-        icon = os.path.join(SCRIPT_PATH, 'Images', 'volume', icon)
-        vol_pix = QtGui.QPixmap(icon).scaledToHeight(
-            self.bar_height-4, QtCore.Qt.SmoothTransformation)
-        self.volume_icon.setPixmap(vol_pix)
-        return f'{int(volume):0>3.0f}%'
-        
-
-class BatteryWidget(GroupWidget):
+        icon_cache.set_icon(
+            self.volume_icon, image_path('volume', icon), self.bar_height-4)
+
+
+class BatteryWidget(SelfUpdatingWidgets):
     '''
     Battery percentage with papirus icons for panel
     '''
     def __init__(self, bar_height=20, **kwargs):
-        self.icons = os.listdir(f'{SCRIPT_PATH}/Images/battery')
-        print(self.icons)
+        self.bar_height = bar_height
         self.battery_icon = QtWidgets.QLabel()
         self.battery_icon.setStyleSheet('padding: 0px; background: transparent')
-        self.battery = SelfUpdatingWidget(
-            '100%', func=self.output, update_period=120)
-        self.bar_height = bar_height
-        super().__init__([self.battery_icon, self.battery], **kwargs)
-
-    def output(self):
-        battery = sp.check_output('acpi --battery', text=True, shell=True).strip()
-        if battery != '':
-            charging = 'Charging' in battery
-            status = battery.split(': ')[1].split(', ')[0]
-            battery = battery.split(': ')[1].split(', ')[1]
-            bat_vlu = int(battery.rstrip('%'))
-            icon_name = f'battery-{round(bat_vlu, -1):0>3.0f}'
-            icon_name += '-charging' if charging else ''
-            icon_name += '.svg'
-            print(icon_name)
-            bat_pix = QtGui.QPixmap(
-                f'{SCRIPT_PATH}/Images/battery/{icon_name}').scaledToHeight(
-                    self.bar_height-4, QtCore.Qt.SmoothTransformation)
-            self.battery_icon.setPixmap(bat_pix)
-        return battery
+        self.battery = TextWidget('100%', stable_width='100%')
+        super().__init__(
+            [self.battery_icon, self.battery], source=bus_source(
+                'battery', metrics.battery, 120,
+                lambda: [UeventTrigger('power_supply')]),
+            **kwargs)
+
+    def update_widget(self, battery):
+        if battery is None:
+            return
+        bat_vlu, status = battery
+        self.battery.set_text(f'{bat_vlu}%')
+        icon_name = f'battery-{round(bat_vlu, -1):0>3.0f}'
+        icon_name += '-charging' if status == 'Charging' else ''
+        icon_name += '.svg'
+        icon_cache.set_icon(
+            self.battery_icon, image_path('battery', icon_name),
+            self.bar_height-4)
+
+
+def ram_percent():
+    return f'{metrics.ram_usage():0>3.0%}'
 
 
 class RamUsageWidget(GroupWidget):
     def __init__(self, update_period=5, bar_height=20, **kwargs):
         self.ram_icon = QtWidgets.QLabel()
-        self.ram_pix = QtGui.QPixmap(
-            f'{SCRIPT_PATH}/Images/ram_tiny.png').scaledToHeight(
-                bar_height-4, QtCore.Qt.SmoothTransformation)
+        self.ram_pix = icon_cache.pixmap(
+            image_path('ram_tiny.png'), bar_height-4,
+            self.ram_icon.devicePixelRatioF())
         self.ram_icon.setPixmap(self.ram_pix)
-        self.ram_icon.setMaximumWidth(self.ram_pix.width())
+        self.ram_icon.setMaximumWidth(
+            round(self.ram_pix.width() / self.ram_pix.devicePixelRatioF()))
         self.ram_icon.setAlignment(QtCore.Qt.AlignCenter)
         self.ram_icon.setStyleSheet('padding: 0px; background: transparent')
 
         ramusage = SelfUpdatingWidget(
-            '', func=self.get_usage, update_period=update_period)
+            '', source=bus_source('ram', ram_percent, update_period),
+            stable_width='100%')
 
         super().__init__([self.ram_icon, ramusage], **kwargs)
 
-    def get_usage(self):
-        ram = sp.check_output('vmstat -s', shell=True, text=True).split('\n')
-        used = int(ram[1].strip().split()[0])/(1024**2)
-        total = int(ram[0].strip().split()[0])/(1024**2)
-        percent = f'{used/total:0>3.0%}'
-        return percent
-
 
 class CpuTempWidget(SelfUpdatingWidget):
-    def __init__(self, level_colors=['white', 'orange', 'red'], **kwargs):
-        super().__init__('', None, self.get_temp, **kwargs)
+    def __init__(self, level_colors=['white', 'orange', 'red'],
+                 update_period=0, **kwargs):
         self.icons_dict = {50: '\uf2cb', 60: '\uf2ca', 70: '\uf2c9',
                            80: '\uf2c8', 90: '\uf2c7'}
         self.level_colors = level_colors
-
-    def get_temp(self):
-        sensors = sp.check_output('sensors', text=True, shell=True)
-        temps = [int(line.split()[2].split('.')[0]) for line in
-                 sensors.split('\n') if line.startswith('Core')]
+        kwargs.setdefault('stable_width', True)
+        super().__init__(
+            '', source=bus_source(
+                'cpu_temp', metrics.core_temps, update_period), **kwargs)
+        self.label.setStyleSheet(state_stylesheet('level', {
+            'normal': {'color': level_colors[0]},
+            'warning': {'color': level_colors[1]},
+            'critical': {'color': level_colors[-1]}}))
+
+    def update_widget(self, temps):
+        if not temps:
+            return
         self.avg_temp = sum(temps)/len(temps)
         self.current_icon = [
             v for k, v in self.icons_dict.items()
             if k >= self.avg_temp or k == 90][0]
-        return f'{self.current_icon} {self.avg_temp:0.0f}℃'
-
-    def update_widget(self, text):
-        self.label.setText(text)
+        super().update_widget(f'{self.current_icon} {self.avg_temp:0.0f}℃')
         if self.avg_temp > 85:
-            self.label.setStyleSheet(f'color: {self.level_colors[-1]}')
+            set_state(self.label, 'level', 'critical')
         elif self.avg_temp > 70:
-            self.label.setStyleSheet(f'color: {self.level_colors[1]}')
+            set_state(self.label, 'level', 'warning')
         else:
-            self.label.setStyleSheet(f'color: {self.level_colors[0]}')
+            set_state(self.label, 'level', 'normal')
 
 
 class CpuUsageWidget(SelfUpdatingWidget):
-    def __init__(self, update_period=5, warning_level=85, **kwargs):
+    '''
+    per_core: show one bar per core instead of the average percent
+    '''
+    bars = '▁▂▃▄▅▆▇█'
+
+    def __init__(self, update_period=5, warning_level=85, per_core=False,
+                 **kwargs):
         self.update_period = update_period
         self.warning_level = warning_level
-        super().__init__('', None, self.sar_out, 0.1, None, None, **kwargs)
+        self.per_core = per_core
+        kwargs.setdefault('stable_width', not per_core and '100%')
+        super().__init__(
+            '', source=cpu_source(update_period), **kwargs)
+        self.label.setStyleSheet(state_stylesheet('level', {
+            'warning': {'background': 'orange'},
+            'critical': {'background': 'red'}}))
+
+    def update_widget(self, sample):
+        if self.per_core:
+            super().update_widget(''.join(
+                self.bars[round(core * (len(self.bars) - 1) / 100)]
+                for core in sample.cores))
+        else:
+            super().update_widget(f'{sample.total:0>3.0f}%')
+        if sample.total > self.warning_level:
+            set_state(self.label, 'level', 'critical')
+        elif sample.total > 70:
+            set_state(self.label, 'level', 'warning')
+        else:
+            set_state(self.label, 'level', 'normal')
 
-    def sar_out(self):
-        sar_output = sp.check_output(
-            f'sar -u {self.update_period} 1', text=True, shell=True)
-        average = sar_output.splitlines()[-1]
-        average = sum(map(float, average.split()[2:5]))
-        return f'{average:0>3.0f}%'
 
-    def update_widget(self, text):
-        self.label.setText(text)
-        if int(text[:-1]) > 85:
-            self.label.setStyleSheet('background: red')
-        elif int(text[:-1]) > 70:
-            self.label.setStyleSheet('background: orange')
+class CpuGraphWidget(GraphWidget):
+    '''
+    History of the cpu usage, per_core shows a heat strip per core
+    '''
+    def __init__(self, update_period=2, per_core=False, history=60,
+                 **kwargs):
+        if per_core:
+            kwargs.setdefault('mode', 'heat')
+            # one per core reported, not os.cpu_count()
+            kwargs.setdefault('channels', None)
+        super().__init__(
+            source=cpu_source(update_period),
+            value=(lambda sample: sample.cores) if per_core
+            else (lambda sample: sample.total),
+            interval=update_period, history=history, **kwargs)
+
+
+class RamGraphWidget(GraphWidget):
+    def __init__(self, update_period=5, history=60, **kwargs):
+        super().__init__(
+            source=bus_source('ram_usage', metrics.ram_usage, update_period),
+            maximum=1, interval=update_period, history=history, **kwargs)
+
+
+class CpuTempGraphWidget(GraphWidget):
+    def __init__(self, update_period=5, history=60, **kwargs):
+        kwargs.setdefault('mode', 'bars')
+        super().__init__(
+            source=bus_source('cpu_temp', metrics.core_temps, update_period),
+            value=lambda temps: sum(temps) / len(temps) if temps else 0,
+            minimum=30, interval=update_period, history=history, **kwargs)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+import threading
+from functools import partial
+from PyQt5 import QtCore
+
+from pyqt5bar.scheduler import default_scheduler
+from pyqt5bar.triggers import renew_all
+
+
+class DataBus:
+    '''
+    Named sources sampled once and fanned out to every subscriber,
+    so widgets on any number of bars showing the same data share one
+    source. A source is started by its first subscriber and stopped when
+    the last one leaves.
+    '''
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler or default_scheduler()
+        self.definitions = {}
+        self.sources = {}
+        self.subscribers = {}
+        self.last_values = {}
+        self.lock = threading.Lock()
+
+    def define(self, name, cmd=None, func=None, update_period=0,
+               update_proc=None, post_proc_func=None, stream=False,
+               triggers=(), adaptive=False, executor=None, timeout=None):
+        '''
+        Describe how to sample name, takes the SelfUpdatingWidget source
+        arguments, the first definition of a name wins. A stopped source
+        closes its triggers, so they are made again from how they were
+        created when it restarts, triggers may also be a callable
+        building new ones every time the source starts.
+        '''
+        self.definitions.setdefault(name, dict(
+            cmd=cmd, func=func, update_period=update_period,
+            update_proc=update_proc, post_proc_func=post_proc_func,
+            stream=stream, triggers=triggers, adaptive=adaptive,
+            executor=executor, timeout=timeout))
+
+    def redefine(self, name, **kwargs):
+        '''
+        Replace the definition of name, a running source is restarted
+        and keeps its subscribers
+        '''
+        with self.lock:
+            self.definitions.pop(name, None)
+            self.define(name, **kwargs)
+            old = self.sources.get(name)
+            if old is None:
+                return
+            self.last_values.pop(name, None)
+            func_obj = self.start_source(name)
+            for slot in self.subscribers[name]:
+                old.update_signal.disconnect(slot)
+                func_obj.update_signal.connect(slot)
+        self.scheduler.unregister(old)
+        if hasattr(old, 'stop'):
+            old.stop()
+        self.scheduler.register(func_obj)
+
+    def undefine(self, name):
+        '''
+        Forget name, a running source stops with its last subscriber
+        '''
+        self.definitions.pop(name, None)
+
+    def start_source(self, name):
+        # imported here, widgets_base itself depends on the bus
+        from pyqt5bar.widgets_base import source_object
+
+        if name not in self.definitions:
+            raise KeyError(f'No source named {name!r} was defined')
+        definition = dict(self.definitions[name])
+        triggers = definition['triggers']
+        if callable(triggers):
+            definition['triggers'] = triggers()
+        elif triggers:
+            # these get closed with the source, the next start renews them
+            self.definitions[name]['triggers'] = partial(renew_all, triggers)
+        func_obj = source_object(scheduler=self.scheduler, **definition)
+        func_obj.name = name
+        # kept in the worker thread, so a subscriber arriving while the
+        # value is on its way to the GUI thread still gets it
+        func_obj.update_signal.connect(
+            lambda value: self.last_values.__setitem__(name, value),
+            QtCore.Qt.DirectConnection)
+        if hasattr(func_obj, 'initial_value'):
+            value = func_obj.initial_value()
+            if value is not None:
+                self.last_values[name] = value
+        self.sources[name] = func_obj
+        return func_obj
+
+    def subscribe(self, name, slot):
+        '''
+        Connect slot to the updates of name, slot is called right away
+        with the last value when the source is already running
+        '''
+        with self.lock:
+            func_obj = self.sources.get(name)
+            started = func_obj is None
+            if started:
+                func_obj = self.start_source(name)
+            self.subscribers.setdefault(name, []).append(slot)
+            func_obj.update_signal.connect(slot)
+            last = self.last_values.get(name)
+        # registered once connected, the first run can't be missed
+        if started:
+            self.scheduler.register(func_obj)
+        if last is not None:
+            slot(last)
+        return func_obj
+
+    def unsubscribe(self, name, slot):
+        with self.lock:
+            slots = self.subscribers.get(name, [])
+            if slot not in slots:
+                return
+            slots.remove(slot)
+            func_obj = self.sources[name]
+            func_obj.update_signal.disconnect(slot)
+            if slots:
+                return
+            # nobody is listening anymore
+            del self.sources[name], self.subscribers[name]
+            self.last_values.pop(name, None)
+        self.scheduler.unregister(func_obj)
+        if hasattr(func_obj, 'stop'):
+            func_obj.stop()
+
+
+_bus = None
+
+
+def default_bus():
+    '''
+    Bus shared by all widgets and bars of the process
+    '''
+    global _bus
+    if _bus is None:
+        _bus = DataBus()
+    return _bus
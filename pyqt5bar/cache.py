@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from functools import wraps
+from concurrent.futures import Future
+
+
+def default_cache_path():
+    cache_home = os.environ.get(
+        'XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(cache_home, 'pyqt5bar', 'cache.sqlite')
+
+
+class ResultCache:
+    '''
+    Results of expensive sources kept for a time to live and persisted
+    in a small sqlite file, so the last value survives restarts.
+    Concurrent fetches of the same key share a single call.
+    '''
+    def __init__(self, path=None):
+        self.path = path or default_cache_path()
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.db = None
+
+    def connect(self):
+        if self.db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS results '
+                '(key TEXT PRIMARY KEY, value TEXT, stored REAL)')
+        return self.db
+
+    def get(self, key):
+        '''
+        (value, age in seconds) of key, None when it was never stored
+        '''
+        with self.lock:
+            row = self.connect().execute(
+                'SELECT value, stored FROM results WHERE key = ?',
+                (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def set(self, key, value):
+        try:
+            value = json.dumps(value)
+        except TypeError:
+            # only json values are persisted
+            return
+        with self.lock:
+            db = self.connect()
+            db.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                (key, value, time.time()))
+            db.commit()
+
+    def fetch(self, key, func, ttl):
+        '''
+        Cached value of key when younger than ttl, otherwise the result
+        of func, callers arriving while func runs wait for that result
+        '''
+        cached = self.get(key)
+        if cached is not None and cached[1] < ttl:
+            return cached[0]
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            # failed fetches return None, keep the last good value
+            if value is not None:
+                self.set(key, value)
+            return value
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+
+_cache = None
+
+
+def result_cache():
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
+
+
+def cached(key, ttl):
+    '''
+    Decorator caching a source function under key for ttl seconds,
+    widgets show the last stored value right away on startup while
+    the source refreshes in the background
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper():
+            return result_cache().fetch(key, func, ttl)
+        wrapper.cache_key = key
+        return wrapper
+    return decorator
+
+
+def last_value(func):
+    '''
+    Last stored value of a cached function, however old, or None
+    '''
+    key = getattr(func, 'cache_key', None)
+    if key is None:
+        return None
+    cached = result_cache().get(key)
+    return None if cached is None else cached[0]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import time
+import traceback
+from PyQt5 import QtCore, sip
+
+from pyqt5bar.profiling import profiler
+from pyqt5bar.startup import startup
+
+
+class UpdateCompositor(QtCore.QObject):
+    '''
+    Collects widget updates and applies them together once per frame,
+    the repaints they ask for are merged by Qt so a burst of updates
+    costs a single layout and repaint of the changed widgets
+
+    interval: frame length in milliseconds
+    '''
+    def __init__(self, interval=16):
+        super().__init__()
+        self.pending = {}
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+    def post(self, widget, value):
+        '''
+        Queue value for widget.update_widget, a newer value for the same
+        widget replaces the pending one
+        '''
+        self.pending[widget] = value
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        for widget, value in pending.items():
+            if sip.isdeleted(widget):
+                continue
+            name = getattr(widget, 'profile_name', type(widget).__name__)
+            start = time.perf_counter()
+            try:
+                widget.update_widget(value)
+            except Exception:
+                # one broken widget mustn't cost the others their update
+                traceback.print_exc()
+                profiler.count(name, 'errors')
+                continue
+            profiler.record(name, 'render', start)
+            profiler.count(name, 'updates')
+            startup.first_update(name)
+
+
+_compositor = None
+
+
+def default_compositor():
+    '''
+    Compositor shared by all bars, created on first use from the GUI
+    thread
+    '''
+    global _compositor
+    if _compositor is None:
+        _compositor = UpdateCompositor()
+    return _compositor
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+'''
+Bars described by a python config file, reloaded when the file is saved.
+
+The config module sets:
+    widgets   list of Spec, 'Stretch' and 'Spacing N' entries
+    bar_props dict of BarProps values
+    sources   dict of data bus source names to DataBus.define arguments
+
+    from pyqt5bar.config import Spec
+    from pyqt5bar.widgets_base import SelfUpdatingWidget
+
+    sources = {'load': dict(cmd='cut -d" " -f1 /proc/loadavg',
+                            update_period=5)}
+    widgets = ['Stretch', Spec(SelfUpdatingWidget, '', source='load')]
+
+Run it with python -m pyqt5bar.config path/to/config.py
+
+On reload the old and new widget trees are compared, widgets whose Spec
+didn't change are kept as they are, with their running sources and last
+values, only the changed ones are rebuilt.
+'''
+
+import os
+import sys
+import runpy
+import traceback
+from functools import partial
+from PyQt5 import QtCore, QtWidgets
+
+from pyqt5bar.bus import default_bus
+from pyqt5bar.main import Bar, run
+from pyqt5bar.triggers import Trigger
+from pyqt5bar.widgets_base import SourceMixin
+
+
+def code_key(code):
+    return (code.co_code, code.co_names, tuple(
+        code_key(c) if hasattr(c, 'co_code') else c
+        for c in code.co_consts))
+
+
+def global_names(code):
+    '''
+    Names code and the functions nested in it may read from globals
+    '''
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            names |= global_names(const)
+    return names
+
+
+def freeze(value, seen=frozenset()):
+    '''
+    Hashable key of a config value, functions defined in the config are
+    compared by their code and the globals they read since every load
+    creates new function objects, triggers by what they were made from
+    '''
+    if isinstance(value, Spec):
+        return value.key
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v, seen) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v, seen)) for k, v in value.items()))
+    if isinstance(value, partial):
+        return ('partial', freeze(value.func, seen),
+                freeze(value.args, seen), freeze(value.keywords, seen))
+    if isinstance(value, Trigger):
+        return ('trigger', type(value), freeze(value.spec, seen))
+    if hasattr(value, '__code__'):
+        if value in seen:
+            # recursive functions would never end
+            return ('function', value.__qualname__)
+        seen = seen | {value}
+        closure = tuple(
+            freeze(cell.cell_contents, seen)
+            for cell in value.__closure__ or ())
+        used_globals = tuple(sorted(
+            (name, freeze(value.__globals__[name], seen))
+            for name in global_names(value.__code__)
+            if name in value.__globals__))
+        return ('function', value.__qualname__, code_key(value.__code__),
+                freeze(value.__defaults__ or (), seen), closure,
+                used_globals)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class Spec:
+    '''
+    Description of a widget, cls(*args, **kwargs) once built, specs
+    nested in the arguments are built first
+    '''
+    def __init__(self, cls, *args, **kwargs):
+        self.cls = cls
+        self.args = args
+        self.kwargs = kwargs
+        self.key = (cls, freeze(args), freeze(kwargs))
+
+    def build(self, reusable):
+        '''
+        Widget of the spec, taken from reusable when an identical spec
+        was built before
+        '''
+        if reusable.get(self.key):
+            wdgt = reusable[self.key].pop()
+            # its children come along with it
+            for child in built_widgets(wdgt)[1:]:
+                if child in reusable.get(child.config_key, ()):
+                    reusable[child.config_key].remove(child)
+            return wdgt
+        wdgt = self.cls(*build(self.args, reusable),
+                        **build(self.kwargs, reusable))
+        wdgt.config_key = self.key
+        return wdgt
+
+
+def build(value, reusable):
+    if isinstance(value, Spec):
+        return value.build(reusable)
+    if isinstance(value, (list, tuple)):
+        return type(value)(build(v, reusable) for v in value)
+    if isinstance(value, dict):
+        return {k: build(v, reusable) for k, v in value.items()}
+    return value
+
+
+def built_widgets(wdgt):
+    '''
+    wdgt and the widgets inside it that were built from a spec
+    '''
+    found = [wdgt] if hasattr(wdgt, 'config_key') else []
+    return found + [w for w in wdgt.findChildren(QtWidgets.QWidget)
+                    if hasattr(w, 'config_key')]
+
+
+def find_triggers(value):
+    '''
+    Trigger objects in a config value
+    '''
+    if isinstance(value, Trigger):
+        return {value}
+    if isinstance(value, Spec):
+        return find_triggers(value.args) | find_triggers(value.kwargs)
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return set().union(*map(find_triggers, value))
+    return set()
+
+
+def load_config(path):
+    config = runpy.run_path(path)
+    return (config.get('widgets', []), config.get('bar_props', {}),
+            config.get('sources', {}))
+
+
+class ConfigBar(QtCore.QObject):
+    '''
+    Bar built from the config at path and updated in place whenever the
+    file changes, a config that fails to load leaves the bar as it is
+    '''
+    def __init__(self, path, app, bus=None, reload_delay=200):
+        super().__init__()
+        self.path = os.path.abspath(path)
+        self.app = app
+        self.bus = bus or default_bus()
+        self.source_keys = {}
+        widgets, self.bar_props, sources = load_config(self.path)
+        self.define_sources(sources)
+        self.bar = Bar(build(widgets, {}), app, **self.bar_props)
+
+        # editors often replace the file, wait for the write to settle
+        self.reload_timer = QtCore.QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(reload_delay)
+        self.reload_timer.timeout.connect(self.reload)
+        self.watcher = QtCore.QFileSystemWatcher(
+            [self.path, os.path.dirname(self.path)], self)
+        self.watcher.fileChanged.connect(self.reload_timer.start)
+        self.watcher.directoryChanged.connect(self.reload_timer.start)
+
+    def show(self):
+        self.bar.show()
+
+    def define_sources(self, sources):
+        '''
+        Define new sources, restart the ones whose definition changed
+        '''
+        for name, definition in sources.items():
+            key = freeze(definition)
+            if self.source_keys.get(name) == key:
+                continue
+            if name in self.source_keys:
+                self.bus.redefine(name, **definition)
+            else:
+                self.bus.define(name, **definition)
+            self.source_keys[name] = key
+        for name in set(self.source_keys) - set(sources):
+            del self.source_keys[name]
+            self.bus.undefine(name)
+
+    def triggers_in_use(self):
+        used = set()
+        for definition in self.bus.definitions.values():
+            if not callable(definition['triggers']):
+                used.update(definition['triggers'])
+        for wdgt in self.bar.findChildren(QtWidgets.QWidget):
+            func_obj = getattr(wdgt, 'func_obj', None)
+            used.update(getattr(func_obj, 'triggers', ()))
+        return used
+
+    def reload(self):
+        if self.path not in self.watcher.files() and os.path.exists(self.path):
+            # the watch is lost when the file is replaced
+            self.watcher.addPath(self.path)
+        try:
+            widgets, bar_props, sources = load_config(self.path)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            return
+        created = find_triggers([widgets, sources])
+        self.define_sources(sources)
+
+        old = [w for wdgt in self.bar.wdgts if not isinstance(wdgt, str)
+               for w in built_widgets(wdgt)]
+        reusable = {}
+        for wdgt in old:
+            reusable.setdefault(wdgt.config_key, []).append(wdgt)
+        self.bar.set_widgets(build(widgets, reusable))
+
+        # whatever wasn't reused is gone from the config
+        removed = [w for wdgts in reusable.values() for w in wdgts]
+        updating = {w for wdgt in removed
+                    for w in [wdgt, *wdgt.findChildren(QtWidgets.QWidget)]
+                    if isinstance(w, SourceMixin)}
+        for wdgt in updating:
+            wdgt.stop()
+        for wdgt in removed:
+            wdgt.hide()
+            wdgt.deleteLater()
+        # loading the config opened triggers for the unchanged sources too
+        for trigger in created - self.triggers_in_use():
+            trigger.close()
+        if freeze(bar_props) != freeze(self.bar_props):
+            self.bar_props = bar_props
+            self.bar.set_props(**bar_props)
+
+
+def main():
+    app = QtWidgets.QApplication(sys.argv)
+    if len(sys.argv) < 2:
+        sys.exit(f'usage: {sys.argv[0]} CONFIG')
+    bar = ConfigBar(sys.argv[1], app)
+    bar.show()
+    sys.exit(run(app))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+'''
+Widgets graphing the recent history of a source, drawn with QPainter
+'''
+
+from array import array
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from pyqt5bar.widgets_base import BaseWidget, SourceMixin
+
+MODES = ('sparkline', 'bars', 'heat')
+
+
+class RingBuffer:
+    '''
+    Last size samples of channels numbers each, kept in one flat array
+    so memory stays fixed whatever the history length
+    '''
+    def __init__(self, size, channels=1, typecode='f'):
+        self.size = size
+        self.channels = channels
+        self.typecode = typecode
+        self.data = array(typecode, [0]) * (size * channels)
+        self.head = 0
+        self.count = 0
+
+    def append(self, sample):
+        '''
+        Add a sample, a number or a sequence of channels numbers,
+        replacing the oldest once full. Longer samples are cut and
+        shorter ones padded with zeros, the rows keep their size.
+        '''
+        if self.channels == 1 and not isinstance(sample, (list, tuple)):
+            sample = (sample,)
+        row = array(self.typecode, sample[:self.channels])
+        row.extend([0] * (self.channels - len(row)))
+        offset = self.head * self.channels
+        self.data[offset:offset + self.channels] = row
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        '''
+        i-th oldest sample, negative indices count from the newest
+        '''
+        if not -self.count <= i < self.count:
+            raise IndexError('ring buffer index out of range')
+        offset = (self.head - self.count + i % self.count) % self.size
+        offset *= self.channels
+        return self.data[offset:offset + self.channels]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+
+class GraphWidget(SourceMixin, BaseWidget):
+    '''
+    Graph of a source's values, one column of step pixels per interval
+    seconds. A new column is drawn by scrolling the cached pixmap and
+    painting only the new column, so a frame costs the same for any
+    history length.
+
+    value   : turns a source value into a number, or a sequence of
+              channels numbers for heat
+    mode    : sparkline, bars or heat, a strip per channel colored from
+              color to hot_color
+    history : number of samples kept and shown
+    channels: numbers per sample, None takes the count of the first one
+    Sampling stops while the scheduler is paused and slows down with
+    its power factor.
+    '''
+    scheduler_changed = QtCore.pyqtSignal()
+
+    def __init__(self, cmd=None, func=None, update_period=0, source=None,
+                 value=float, mode='sparkline', history=60, step=2,
+                 interval=1, minimum=0, maximum=100, channels=1,
+                 color='white', hot_color='red', scheduler=None, bus=None,
+                 **kwargs):
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {", ".join(MODES)}')
+        super().__init__(**kwargs)
+        self.value = value
+        self.mode = mode
+        self.step = step
+        self.minimum, self.maximum = minimum, maximum
+        self.color = QtGui.QColor(color)
+        self.hot_color = QtGui.QColor(hot_color)
+        self.interval = interval
+        self.history = history
+        self.samples = RingBuffer(history, channels) if channels else None
+        self.latest = None
+        self.pixmap = None
+        self.setFixedWidth(history * step)
+
+        # sampled on our own clock, sources only emit changed values
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.tick)
+        self.start_source(
+            cmd, func, update_period, None, None, False, (), source,
+            scheduler, bus)
+        # the scheduler may change from a worker thread, the signal
+        # brings it to ours
+        self.notify = self.scheduler_changed.emit
+        self.scheduler_changed.connect(self.follow_scheduler)
+        self.scheduler.add_listener(self.notify)
+        self.follow_scheduler()
+
+    def follow_scheduler(self):
+        if self.scheduler.paused:
+            self.timer.stop()
+            return
+        self.timer.start(
+            int(self.interval * self.scheduler.power_factor * 1000))
+
+    def stop(self):
+        super().stop()
+        self.scheduler.remove_listener(self.notify)
+        self.timer.stop()
+
+    def update_widget(self, value):
+        self.latest = self.value(value)
+        if self.samples is None:
+            channels = len(self.latest) \
+                if isinstance(self.latest, (list, tuple)) else 1
+            self.samples = RingBuffer(self.history, channels)
+
+    def tick(self):
+        if self.latest is None:
+            return
+        self.samples.append(self.latest)
+        if self.pixmap is None or not self.isVisible():
+            # redrawn in full when shown
+            self.pixmap = None
+            return
+        self.scroll_in()
+        self.update()
+
+    def level(self, v):
+        level = (v - self.minimum) / (self.maximum - self.minimum)
+        return min(max(level, 0), 1)
+
+    def heat(self, level):
+        c, h = self.color, self.hot_color
+        return QtGui.QColor.fromRgbF(
+            *(a + (b - a) * level for a, b in (
+                (c.redF(), h.redF()), (c.greenF(), h.greenF()),
+                (c.blueF(), h.blueF()), (c.alphaF(), h.alphaF()))))
+
+    def draw_sample(self, painter, x, sample, previous):
+        '''
+        Paint sample in the column starting at x, previous is the sample
+        of the column on its left, None for the first
+        '''
+        height = self.height()
+        if self.mode == 'sparkline':
+            y = (1 - self.level(sample[0])) * (height - 1)
+            if previous is None:
+                painter.drawPoint(QtCore.QPointF(x + self.step / 2, y))
+                return
+            prev_y = (1 - self.level(previous[0])) * (height - 1)
+            painter.drawLine(QtCore.QPointF(x - self.step / 2, prev_y),
+                             QtCore.QPointF(x + self.step / 2, y))
+        elif self.mode == 'bars':
+            bar = self.level(sample[0]) * height
+            painter.fillRect(QtCore.QRectF(
+                x, height - bar, max(self.step - 1, 1), bar), self.color)
+        else:
+            strip = height / len(sample)
+            for i, v in enumerate(sample):
+                painter.fillRect(
+                    QtCore.QRectF(x, i * strip, self.step, strip),
+                    self.heat(self.level(v)))
+
+    def painter(self):
+        painter = QtGui.QPainter(self.pixmap)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(QtGui.QPen(self.color, 1))
+        return painter
+
+    def scroll_in(self):
+        ratio = self.pixmap.devicePixelRatio()
+        self.pixmap.scroll(
+            -round(self.step * ratio), 0, self.pixmap.rect())
+        x = self.width() - self.step
+        painter = self.painter()
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        painter.fillRect(
+            QtCore.QRectF(x, 0, self.step, self.height()),
+            QtCore.Qt.transparent)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+        previous = self.samples[-2] if len(self.samples) > 1 else None
+        self.draw_sample(painter, x, self.samples[-1], previous)
+        painter.end()
+
+    def redraw(self):
+        ratio = self.devicePixelRatioF()
+        self.pixmap = QtGui.QPixmap(self.size() * ratio)
+        self.pixmap.setDevicePixelRatio(ratio)
+        self.pixmap.fill(QtCore.Qt.transparent)
+        painter = self.painter()
+        samples = self.samples or ()
+        x = self.width() - len(samples) * self.step
+        previous = None
+        for sample in samples:
+            self.draw_sample(painter, x, sample, previous)
+            previous = sample
+            x += self.step
+        painter.end()
+
+    def resizeEvent(self, ev):
+        self.pixmap = None
+        super().resizeEvent(ev)
+
+    def paintEvent(self, ev):
+        if self.pixmap is None \
+                or self.pixmap.devicePixelRatio() != self.devicePixelRatioF():
+            self.redraw()
+        painter = QtGui.QPainter(self)
+        # background and border of the stylesheet
+        option = QtWidgets.QStyleOption()
+        option.initFrom(self)
+        self.style().drawPrimitive(
+            QtWidgets.QStyle.PE_Widget, option, painter, self)
+        painter.drawPixmap(0, 0, self.pixmap)
+        painter.end()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+'''
+HTTP fetching for network widgets: one keep-alive connection pool for
+the whole bar, conditional requests so unchanged pages aren't downloaded
+again, and extraction of the interesting part of the page
+
+    SelfUpdatingWidget('', func=HttpFetcher(
+        'https://example.com/status.json', jsonpath='$.services[*].state'),
+        update_period=600, post_proc_func=', '.join)
+'''
+
+import re
+import sys
+import json
+import time
+import threading
+from functools import partial
+
+from pyqt5bar.process_pool import default_process_pool
+
+USER_AGENT = 'pyqt5bar'
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session():
+    '''
+    requests session shared by all fetchers, its pool keeps connections
+    alive between refreshes
+    '''
+    global _session
+    with _session_lock:
+        if _session is None:
+            # only network widgets need requests
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+            _session.headers['User-Agent'] = USER_AGENT
+    return _session
+
+
+JSONPATH_TOKEN = re.compile(
+    r'\.(\*|[^.\[\]]+)|\[(\*|-?\d+|\'[^\']*\'|"[^"]*")\]')
+
+
+def jsonpath(data, path):
+    '''
+    Values of data at path, a JSONPath of keys, indices and wildcards
+    such as $.items[0].name or $.items[*]['full name']
+    '''
+    path = path[1:] if path.startswith('$') else path
+    matches = [data]
+    position = 0
+    while position < len(path):
+        token = JSONPATH_TOKEN.match(path, position)
+        if token is None:
+            raise ValueError(f'Unsupported JSONPath {path!r}')
+        position = token.end()
+        key = token.group(1) or token.group(2).strip('\'"')
+        found = []
+        for value in matches:
+            if key == '*':
+                if isinstance(value, dict):
+                    found.extend(value.values())
+                elif isinstance(value, list):
+                    found.extend(value)
+            elif isinstance(value, list):
+                try:
+                    found.append(value[int(key)])
+                except (ValueError, IndexError):
+                    pass
+            elif isinstance(value, dict) and key in value:
+                found.append(value[key])
+        matches = found
+    return matches
+
+
+def extract(body, encoding, selector=None, path=None, parse=None):
+    '''
+    The interesting part of a page, see HttpFetcher
+    '''
+    if parse is not None:
+        return parse(body, encoding)
+    if path is not None:
+        return jsonpath(json.loads(body), path)
+    if selector is not None:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(body, features='lxml')
+        return [el.get_text(strip=True) for el in soup.select(selector)]
+    return body.decode(encoding, errors='replace')
+
+
+class HttpFetcher:
+    '''
+    Callable fetching url, the last result is reused when the server
+    answers 304 Not Modified to the ETag or Last-Modified it sent
+
+    selector : CSS selector, the texts of the matching elements
+    jsonpath : JSONPath into the JSON body, the matching values
+    parse    : parse(body, encoding) returning the value, for pages a
+               selector can't describe
+    executor : 'process' parses the page in the source process pool,
+               fetching stays here so the connection pool and the
+               validators are kept between refreshes
+    timeout  : limit in seconds on the request, half of it for
+               connecting and every read blocking at most the other half
+    max_bytes: bodies longer than this are refused
+    On failure the last value is returned, so widgets keep showing it.
+    '''
+    def __init__(self, url, selector=None, jsonpath=None, parse=None,
+                 executor=None, headers=None, timeout=10,
+                 max_bytes=5 * 2 ** 20, chunk_size=2 ** 13):
+        self.url = url
+        self.selector = selector
+        self.jsonpath = jsonpath
+        self.parse = parse
+        if executor == 'process':
+            executor = default_process_pool()
+        self.executor = executor
+        if executor is not None:
+            executor.preload(extract)
+            if parse is not None:
+                executor.preload(parse)
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.etag = None
+        self.last_modified = None
+        self.value = None
+
+    def __repr__(self):
+        return f'GET {self.url}'
+
+    def __call__(self):
+        try:
+            return self.fetch()
+        except Exception as e:
+            print(f'{self!r} failed: {e}', file=sys.stderr)
+            return self.value
+
+    def fetch(self):
+        headers = dict(self.headers)
+        if self.value is not None:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+        deadline = time.monotonic() + self.timeout
+        # requests' timeout bounds the connect and each read separately
+        with session().get(self.url, headers=headers, stream=True,
+                           timeout=(self.timeout / 2, self.timeout / 2)
+                           ) as response:
+            if response.status_code == 304:
+                # an unread response closes its connection instead of
+                # returning it to the pool
+                response.content
+                return self.value
+            response.raise_for_status()
+            body = self.read(response, deadline)
+            self.etag = response.headers.get('ETag')
+            self.last_modified = response.headers.get('Last-Modified')
+            encoding = response.encoding or 'utf-8'
+        self.value = self.extract(body, encoding)
+        return self.value
+
+    def read(self, response, deadline):
+        '''
+        Body of response, decompressed as it streams in
+        '''
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(self.chunk_size):
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise ValueError(f'body larger than {self.max_bytes} bytes')
+            # the socket timeout only bounds each read
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'no full answer in {self.timeout}s')
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def extract(self, body, encoding):
+        job = partial(extract, body, encoding, self.selector, self.jsonpath,
+                      self.parse)
+        if self.executor is None:
+            return job()
+        return self.executor.call(job, self.timeout)
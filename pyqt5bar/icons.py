@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import os
+from collections import OrderedDict
+from PyQt5 import QtCore, QtGui, QtSvg
+
+IMAGES_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'Images')
+
+
+class IconCache:
+    '''
+    Least recently used cache of icons rendered at a given height and
+    device pixel ratio, svg files are rendered with QSvgRenderer so they
+    stay sharp on high dpi screens. Lookups must happen on the GUI thread.
+    '''
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.pixmaps = OrderedDict()
+
+    def render(self, path, height, device_pixel_ratio=1.0):
+        '''
+        Render path to a QImage of height logical pixels
+        '''
+        pixel_height = round(height * device_pixel_ratio)
+        if path.endswith('.svg'):
+            renderer = QtSvg.QSvgRenderer(path)
+            size = renderer.defaultSize()
+            width = round(size.width() * pixel_height / max(size.height(), 1))
+            image = QtGui.QImage(
+                width, pixel_height, QtGui.QImage.Format_ARGB32_Premultiplied)
+            image.fill(QtCore.Qt.transparent)
+            painter = QtGui.QPainter(image)
+            renderer.render(painter)
+            painter.end()
+        else:
+            image = QtGui.QImage(path).scaledToHeight(
+                pixel_height, QtCore.Qt.SmoothTransformation)
+        image.setDevicePixelRatio(device_pixel_ratio)
+        return image
+
+    def pixmap(self, path, height, device_pixel_ratio=1.0):
+        key = (path, height, device_pixel_ratio)
+        if key in self.pixmaps:
+            self.pixmaps.move_to_end(key)
+            return self.pixmaps[key]
+        pixmap = QtGui.QPixmap.fromImage(
+            self.render(path, height, device_pixel_ratio))
+        self.pixmaps[key] = pixmap
+        if len(self.pixmaps) > self.maxsize:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+
+    def set_icon(self, label, path, height):
+        '''
+        Show path on label, rendered for the label's screen
+        '''
+        label.setPixmap(self.pixmap(path, height, label.devicePixelRatioF()))
+
+
+# shared by every widget and bar of the process
+icon_cache = IconCache()
+
+
+def image_path(*parts):
+    return os.path.join(IMAGES_PATH, *parts)
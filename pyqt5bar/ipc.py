@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+'''
+Local socket where other programs push updates to named widgets, for
+data that changes on events the bar can't see, without polling.
+
+Every message is a 4 byte big endian length followed by a JSON object
+naming the widget and any of text, state and icon:
+
+    {"widget": "mail", "text": "3", "state": "unread", "icon": "/x.svg"}
+
+From a shell, window manager hook or udev rule, with pyqt5bar.push:
+
+    python -m pyqt5bar.push mail --text 3 --state unread
+'''
+
+import sys
+import json
+import time
+from functools import partial
+from PyQt5 import QtCore, QtWidgets, QtNetwork, sip
+
+from pyqt5bar.compositor import default_compositor
+from pyqt5bar.icons import icon_cache
+from pyqt5bar.push import HEADER, default_socket_path
+from pyqt5bar.styling import state_stylesheet, set_state
+from pyqt5bar.widgets_base import TextWidget
+
+class IpcServer(QtCore.QObject):
+    '''
+    Applies pushed messages to registered widgets, messages for a widget
+    arriving within min_interval seconds are merged and applied once,
+    so a script looping as fast as it can costs one update per interval
+
+    max_message: connections sending longer messages are dropped
+    '''
+    def __init__(self, path=None, min_interval=0.05, max_message=65536):
+        super().__init__()
+        self.path = path or default_socket_path()
+        self.min_interval = min_interval
+        self.max_message = max_message
+        self.widgets = {}
+        self.buffers = {}
+        self.pending = {}
+        self.last_applied = {}
+        self.server = QtNetwork.QLocalServer(self)
+        if self.in_use():
+            raise OSError(f'Another bar is listening on {self.path}')
+        # a socket left behind by a bar that crashed
+        QtNetwork.QLocalServer.removeServer(self.path)
+        if not self.server.listen(self.path):
+            raise OSError(self.server.errorString())
+        self.server.newConnection.connect(self.accept)
+
+    def in_use(self):
+        '''
+        True when something answers on the socket path
+        '''
+        probe = QtNetwork.QLocalSocket()
+        probe.connectToServer(self.path)
+        answered = probe.waitForConnected(200)
+        probe.abort()
+        return answered
+
+    def register(self, name, widget):
+        '''
+        Route messages for name to widget.update_widget, every widget
+        registered under a name gets them (one per bar, or an old one
+        until a reloaded config replaces it)
+        '''
+        self.widgets.setdefault(name, []).append(widget)
+        widget.destroyed.connect(partial(self.unregister, name, widget))
+
+    def unregister(self, name, widget):
+        widgets = self.widgets.get(name, [])
+        if widget in widgets:
+            widgets.remove(widget)
+        if widgets:
+            return
+        self.widgets.pop(name, None)
+        self.pending.pop(name, None)
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            conn = self.server.nextPendingConnection()
+            self.buffers[conn] = bytearray()
+            conn.readyRead.connect(partial(self.read, conn))
+            conn.disconnected.connect(partial(self.close, conn))
+            self.read(conn)
+
+    def close(self, conn):
+        self.buffers.pop(conn, None)
+        conn.deleteLater()
+
+    def read(self, conn):
+        buffer = self.buffers.get(conn)
+        if buffer is None:
+            return
+        buffer += bytes(conn.readAll())
+        while len(buffer) >= HEADER:
+            size = int.from_bytes(buffer[:HEADER], 'big')
+            if size > self.max_message:
+                print(f'IPC message of {size} bytes dropped', file=sys.stderr)
+                conn.abort()
+                return
+            if len(buffer) < HEADER + size:
+                return
+            data = bytes(buffer[HEADER:HEADER + size])
+            del buffer[:HEADER + size]
+            try:
+                self.handle(json.loads(data))
+            except (ValueError, TypeError, KeyError, AttributeError) as e:
+                print(f'Bad IPC message {data!r}: {e}', file=sys.stderr)
+
+    def handle(self, message):
+        name = message.pop('widget')
+        if name not in self.widgets:
+            raise KeyError(f'no widget named {name!r}')
+        scheduled = name in self.pending
+        self.pending.setdefault(name, {}).update(message)
+        if scheduled:
+            return
+        wait = self.last_applied.get(name, 0) + self.min_interval \
+            - time.monotonic()
+        QtCore.QTimer.singleShot(
+            max(0, int(wait * 1000)), partial(self.apply, name))
+
+    def apply(self, name):
+        message = self.pending.pop(name, None)
+        widgets = [widget for widget in self.widgets.get(name, ())
+                   if not sip.isdeleted(widget)]
+        if message is None or not widgets:
+            return
+        self.last_applied[name] = time.monotonic()
+        for widget in widgets:
+            default_compositor().post(widget, message)
+
+
+_server = None
+
+
+def default_ipc_server():
+    '''
+    Server at the default socket path, started on first use from the
+    GUI thread
+    '''
+    global _server
+    if _server is None:
+        _server = IpcServer()
+    return _server
+
+
+class PushWidget(TextWidget):
+    '''
+    Text with an optional icon, updated only by messages pushed to name
+
+    states: maps the values of the state field to props dicts
+    '''
+    def __init__(self, name, inittext='', states=None, icon_height=16,
+                 server=None, **kwargs):
+        super().__init__(inittext, **kwargs)
+        self.name = name
+        self.profile_name = name
+        self.icon_height = icon_height
+        self.icon = None
+        if states:
+            self.label.setStyleSheet(state_stylesheet('state', states))
+        (server or default_ipc_server()).register(name, self)
+
+    def update_widget(self, message):
+        if 'text' in message:
+            self.set_text(str(message['text']))
+        if 'state' in message:
+            set_state(self.label, 'state', message['state'])
+        if 'icon' in message:
+            self.set_icon(message['icon'])
+
+    def set_icon(self, path):
+        if self.icon is None:
+            self.icon = QtWidgets.QLabel()
+            self.icon.setStyleSheet('padding: 0px; background: transparent')
+            self.hbox.insertWidget(0, self.icon)
+        if not path:
+            self.icon.hide()
+            return
+        icon_cache.set_icon(self.icon, path, self.icon_height)
+        self.icon.show()
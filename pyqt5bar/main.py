@@ -1,22 +1,66 @@
 #!/usr/bin/env python
 
+import os
 import sys
+import time
 from PyQt5 import QtWidgets, QtCore, QtGui, Qt
 
-from pyqt5bar.widgets_base import TextWidget, SelfUpdatingWidget
+from pyqt5bar.widgets_base import TextWidget, SelfUpdatingWidget, SourceMixin
+from pyqt5bar.profiling import enable_profiling, profiler, StatsOverlay
+from pyqt5bar.startup import startup
+from pyqt5bar.process_pool import default_process_pool
+from pyqt5bar.scheduler import default_scheduler
+
+# bars currently on screen, sources are paused when there is none
+visible_bars = set()
+
+
+def run(app, shutdown_timeout=2):
+    '''
+    Run app until it quits and stop the sources, returns the exit status.
+    Sources still stuck after shutdown_timeout seconds don't hold up the
+    exit.
+    '''
+    status = app.exec_()
+    shutdown_sources(shutdown_timeout, status)
+    return status
+
+
+def shutdown_sources(timeout, status=0):
+    deadline = time.monotonic() + timeout
+    default_process_pool().shutdown()
+    if default_scheduler().shutdown(max(deadline - time.monotonic(), 0)):
+        return
+    print('Sources still running at exit, not waiting for them',
+          file=sys.stderr)
+    # python would join the stuck worker threads before exiting, leave
+    # now, exit handlers don't run so finish what they would have done
+    profiler.finish()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(status)
+
 
 class BarProps:
     '''
-    Stores the bar properties, with defaults
+    Stores the bar properties, with defaults, the bar spans the top of
+    screen, the primary screen when not given
     '''
-    def __init__(self, app, **kwargs):
-        self.x, self.y, self.widgets_spacing = 0, 0, 0
-        self.width = app.primaryScreen().size().width()
+    def __init__(self, app, screen=None, **kwargs):
+        geometry = (screen or app.primaryScreen()).geometry()
+        self.x, self.y, self.widgets_spacing = geometry.x(), geometry.y(), 0
+        self.width = geometry.width()
         self.height, self.rounded_corner = 20, '0px'
         self.background = 'transparent'
         self.font_family = '"Fira Code"'
         self.font_weight = 'normal'
         self.font_size = 10
+        # print startup timings this many seconds after showing, 0 is off
+        self.startup_report = 0
+        # suspend every source while no bar is visible
+        self.pause_when_hidden = True
+        # multiply update periods by this while on battery, 1 is off
+        self.low_power_factor = 1
 
         # update with user set values
         for k, v in kwargs.items():
@@ -24,14 +68,83 @@ class BarProps:
 
 
 class Bar(QtWidgets.QWidget):
-    def __init__(self, wdgts, app, **kwargs):
+    def __init__(self, wdgts, app, screen=None, **kwargs):
         super().__init__()
         self.app = app
-        self.props = BarProps(app, **kwargs)
+        self.bar_screen = screen
+        self.props = BarProps(app, screen, **kwargs)
         self.wdgts = wdgts
         self.initProps()
+        if self.props.low_power_factor != 1:
+            default_scheduler().follow_power_supply(self.props.low_power_factor)
+        startup.mark('bar created')
 
-    def initProps(self):
+    def set_visible(self, visible):
+        '''
+        Track if the bar is on screen, pausing sources when no bar is
+        '''
+        if visible:
+            visible_bars.add(self)
+            default_scheduler().resume()
+            return
+        visible_bars.discard(self)
+        if not visible_bars and self.props.pause_when_hidden:
+            default_scheduler().pause()
+
+    def set_widgets(self, wdgts):
+        '''
+        Replace the widgets of the bar, the old ones are left to the
+        caller to reuse or delete
+        '''
+        while self.main_layout.count():
+            item = self.main_layout.takeAt(0)
+            if item.widget() is self.close_button:
+                self.close_button.deleteLater()
+        self.wdgts = wdgts
+        self.populate_widgets()
+
+    def set_props(self, **kwargs):
+        self.props = BarProps(self.app, self.bar_screen, **kwargs)
+        self.stylize()
+        self.inforce_bar_height()
+
+    def move_to(self, geometry):
+        '''
+        Span the top of geometry, follows resolution changes of a screen
+        '''
+        self.props.x, self.props.y = geometry.x(), geometry.y()
+        self.props.width = geometry.width()
+        self.inforce_bar_height()
+
+    def stop_sources(self):
+        '''
+        Detach every updating widget from its source, shared sources keep
+        running for the other bars
+        '''
+        for wdgt in self.findChildren(QtWidgets.QWidget):
+            if isinstance(wdgt, SourceMixin):
+                wdgt.stop()
+
+    def hideEvent(self, ev):
+        self.set_visible(False)
+        super().hideEvent(ev)
+
+    def changeEvent(self, ev):
+        if ev.type() == QtCore.QEvent.WindowStateChange and self.isVisible():
+            self.set_visible(not self.isMinimized())
+        super().changeEvent(ev)
+
+    def showEvent(self, ev):
+        self.set_visible(True)
+        if 'bar shown' not in startup.marks:
+            startup.mark('bar shown')
+            if self.props.startup_report:
+                QtCore.QTimer.singleShot(
+                    int(self.props.startup_report * 1000),
+                    lambda: print(startup.report()))
+        super().showEvent(ev)
+
+    def set_window_flags(self):
         bypass = Qt.Qt.BypassWindowManagerHint
         for flag in (
                 Qt.Qt.WindowStaysOnBottomHint, Qt.Qt.FramelessWindowHint,
@@ -40,6 +153,9 @@ class Bar(QtWidgets.QWidget):
         self.setAttribute(Qt.Qt.WA_TranslucentBackground)
         self.setAttribute(Qt.Qt.WA_X11NetWmWindowTypeDock)
 
+    def initProps(self):
+        self.set_window_flags()
+
         self.main_layout = QtWidgets.QHBoxLayout()
 
         holder_layout = QtWidgets.QHBoxLayout()
@@ -91,6 +207,7 @@ class Bar(QtWidgets.QWidget):
         close.setFlat(True)
         close.setMaximumHeight(self.props.height)
         close.setStyleSheet('border: 0px none transparent')
+        self.close_button = close
 
         for wdgt in self.wdgts:
             if not isinstance(wdgt, str):
@@ -105,9 +222,53 @@ class Bar(QtWidgets.QWidget):
         self.inforce_bar_height()
 
 
+class MultiScreenBar(QtCore.QObject):
+    '''
+    One bar on every screen, following screens as they are plugged in
+    and out. factory(screen) returns the widgets of a bar, widgets
+    showing data bus sources make all bars share a single set of sources.
+
+    bar_class: Bar or a subclass such as pyqt5bar.painted.PaintedBar
+    '''
+    def __init__(self, factory, app, bar_class=Bar, **kwargs):
+        super().__init__()
+        self.factory = factory
+        self.bar_class = bar_class
+        self.app = app
+        self.kwargs = kwargs
+        self.bars = {}
+        for screen in app.screens():
+            self.add_screen(screen)
+        app.screenAdded.connect(self.add_screen)
+        app.screenRemoved.connect(self.remove_screen)
+
+    def add_screen(self, screen):
+        if screen in self.bars:
+            return
+        bar = self.bar_class(
+            self.factory(screen), self.app, screen, **self.kwargs)
+        screen.geometryChanged.connect(bar.move_to)
+        self.bars[screen] = bar
+        bar.show()
+
+    def remove_screen(self, screen):
+        bar = self.bars.pop(screen, None)
+        if bar is None:
+            return
+        bar.stop_sources()
+        bar.hide()
+        bar.deleteLater()
+
+    def show(self):
+        for bar in self.bars.values():
+            bar.show()
+
+
 if __name__ == '__main__':
     app = QtWidgets.QApplication(sys.argv)
     app.setAttribute(Qt.Qt.AA_UseHighDpiPixmaps)
+    if '--profile' in sys.argv:
+        enable_profiling(trace_path='pyqt5bar-trace.json')
     bar = Bar(
         [
             TextWidget('Welcome!', background='Indigo', border_radius='9px',
@@ -119,7 +280,9 @@ if __name__ == '__main__':
                 'test', 'date +"%a, %d-%B-%Y | %I:%M:%S"', None, 1, update_proc=None,
                 post_proc_func=lambda x: x.strip(), background='Indigo', border_radius='9px', padding_left='9px', padding_right='9px'),
         ],
-        rounded_corner='5px')
+        app, rounded_corner='5px')
+    if '--profile' in sys.argv:
+        StatsOverlay(bar)
     bar.show()
-    sys.exit(app.exec_())
+    sys.exit(run(app))
     
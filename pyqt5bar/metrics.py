@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+'''
+System metrics read straight from /proc and /sys, the files are opened
+once and re-read with pread so a sample never spawns a process
+'''
+
+import os
+import glob
+import time
+import threading
+from collections import namedtuple
+
+PROC_MEMINFO = '/proc/meminfo'
+PROC_STAT = '/proc/stat'
+HWMON_PATH = '/sys/class/hwmon'
+POWER_SUPPLY_PATH = '/sys/class/power_supply'
+
+# hwmon drivers reporting the cpu package/cores temperature
+CPU_HWMON_DRIVERS = ('coretemp', 'k10temp', 'zenpower', 'cpu_thermal')
+
+
+class ProcFile:
+    '''
+    Keeps a file descriptor open and reads the whole file from offset 0
+    on every call, procfs and sysfs regenerate the content on each read
+    '''
+    def __init__(self, path, bufsize=4096):
+        self.path = path
+        self.bufsize = bufsize
+        self.fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+
+    def read(self):
+        while True:
+            data = os.pread(self.fd, self.bufsize, 0)
+            if len(data) < self.bufsize:
+                return data.decode()
+            # content didn't fit, grow the buffer and read again
+            self.bufsize *= 2
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __del__(self):
+        self.close()
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def proc_file(path):
+    '''
+    Shared ProcFile for path, opened on first use
+    '''
+    with _files_lock:
+        if path not in _files:
+            _files[path] = ProcFile(path)
+        return _files[path]
+
+
+def read_value(path):
+    return proc_file(path).read().strip()
+
+
+def meminfo():
+    '''
+    /proc/meminfo as a dict of kB values
+    '''
+    info = {}
+    for line in proc_file(PROC_MEMINFO).read().splitlines():
+        key, value = line.split(':', 1)
+        info[key] = int(value.split()[0])
+    return info
+
+
+def ram_usage():
+    '''
+    Fraction of memory in use, excluding caches and buffers
+    '''
+    info = meminfo()
+    total = info['MemTotal']
+    available = info.get('MemAvailable', info['MemFree'])
+    return (total - available) / total
+
+
+def cpu_times():
+    '''
+    Jiffies counters from /proc/stat, {'cpu': [...], 'cpu0': [...], ...}
+    in the kernel order user, nice, system, idle, iowait, irq, softirq,
+    steal
+    '''
+    times = {}
+    for line in proc_file(PROC_STAT).read().splitlines():
+        if not line.startswith('cpu'):
+            break
+        name, *values = line.split()
+        times[name] = [int(v) for v in values[:8]]
+    return times
+
+
+CpuUsage = namedtuple('CpuUsage', 'total iowait steal cores')
+
+
+class CpuSampler:
+    '''
+    Cpu utilization from the delta of /proc/stat counters between two
+    samples, never blocks. Reads closer than min_interval share the same
+    counters so any number of widgets cost a single read.
+
+    sample(consumer) returns a CpuUsage of percents over the time since
+    that consumer's previous sample, cores lists the busy percent of
+    every core
+    '''
+    def __init__(self, min_interval=0.5):
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.times = None
+        self.read_time = 0
+        # counters and result of the previous sample of each consumer
+        self.prev_times = {}
+        self.last = {}
+
+    @staticmethod
+    def busy(delta):
+        # everything but idle and iowait counts as busy
+        return 100 * (sum(delta) - delta[3] - delta[4]) / max(sum(delta), 1)
+
+    def sample(self, consumer=None):
+        with self.lock:
+            now = time.monotonic()
+            if self.times is None or \
+                    now - self.read_time >= self.min_interval:
+                self.times = cpu_times()
+                self.read_time = now
+            times = self.times
+            if self.prev_times.get(consumer) is times:
+                return self.last[consumer]
+            prev_times = self.prev_times.get(consumer) or {
+                name: [0] * len(values) for name, values in times.items()}
+            deltas = {
+                name: [n - p for n, p in zip(values, prev_times.get(
+                    name, [0] * len(values)))]
+                for name, values in times.items()}
+            total = deltas.pop('cpu')
+            jiffies = max(sum(total), 1)
+            # older kernels don't count steal time
+            steal = total[7] if len(total) > 7 else 0
+            usage = CpuUsage(
+                self.busy(total), 100 * total[4] / jiffies,
+                100 * steal / jiffies,
+                [self.busy(deltas[name]) for name in sorted(
+                    deltas, key=lambda name: int(name[3:]))])
+            self.prev_times[consumer] = times
+            self.last[consumer] = usage
+            return usage
+
+
+# shared by every cpu widget
+cpu_sampler = CpuSampler()
+
+
+_cpu_sensors = None
+
+
+def cpu_sensors():
+    '''
+    (label, path) of every cpu temperature input, looked up once
+    '''
+    global _cpu_sensors
+    if _cpu_sensors is not None:
+        return _cpu_sensors
+    sensors = []
+    for hwmon in sorted(glob.glob(f'{HWMON_PATH}/hwmon*')):
+        try:
+            name = read_value(f'{hwmon}/name')
+        except OSError:
+            continue
+        if name not in CPU_HWMON_DRIVERS:
+            continue
+        for temp_input in sorted(glob.glob(f'{hwmon}/temp*_input')):
+            label_path = temp_input.replace('_input', '_label')
+            try:
+                label = read_value(label_path)
+            except OSError:
+                label = name
+            sensors.append((label, temp_input))
+    _cpu_sensors = sensors
+    return sensors
+
+
+def core_temps():
+    '''
+    Temperatures in ℃ of the cpu cores, falls back to the package
+    sensor on machines without per core readings
+    '''
+    sensors = cpu_sensors()
+    cores = [path for label, path in sensors if label.startswith('Core')]
+    paths = cores or [path for _, path in sensors]
+    return [int(read_value(path)) / 1000 for path in paths]
+
+
+_battery_path = None
+
+
+def battery_path():
+    '''
+    First power supply of type Battery, None when there is none
+    '''
+    global _battery_path
+    if _battery_path is not None:
+        return _battery_path
+    for supply in sorted(glob.glob(f'{POWER_SUPPLY_PATH}/*')):
+        try:
+            if read_value(f'{supply}/type') == 'Battery':
+                _battery_path = supply
+                break
+        except OSError:
+            continue
+    return _battery_path
+
+
+def battery():
+    '''
+    (capacity percent, status) of the battery, status is one of the
+    kernel strings Charging, Discharging, Full, Not charging, Unknown
+    '''
+    path = battery_path()
+    if path is None:
+        return None
+    return (int(read_value(f'{path}/capacity')),
+            read_value(f'{path}/status'))
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+'''
+Bar painting all of its items on a single surface, a lighter alternative
+to a QWidget, stylesheet and layout per item
+
+    PaintedBar([
+        PaintedText('Welcome!', background='Indigo', radius=9),
+        'Stretch',
+        PaintedText(source='clock', click_func=lambda: print('clicked')),
+    ], app)
+'''
+
+from PyQt5 import QtCore, QtGui
+
+from pyqt5bar.compositor import default_compositor
+from pyqt5bar.main import Bar
+from pyqt5bar.widgets_base import SourceMixin
+
+
+class PaintedText(SourceMixin):
+    '''
+    Text painted by a PaintedBar, fed like a SelfUpdatingWidget when
+    given cmd, func or source, and static otherwise
+
+    value: turns a source value into the text, str by default
+    '''
+    __slots__ = (
+        'text', 'static', 'x', 'width', 'color', 'background', 'padding',
+        'radius', 'value', 'bar', 'source_args', 'click_func', 'hover_func',
+        'doubleclick_func', 'scrollup_func', 'scrolldown_func',
+        'scheduler', 'source', 'bus', 'profile_name', 'func_obj',
+        '__weakref__')
+
+    def __init__(self, text='', cmd=None, func=None, update_period=0,
+                 update_proc=None, post_proc_func=None, stream=False,
+                 triggers=(), source=None, adaptive=False, scheduler=None,
+                 bus=None, executor=None, timeout=None, value=str,
+                 color=None, background=None,
+                 padding=4, radius=0, click_func=None, hover_func=None,
+                 doubleclick_func=None, scrollup_func=None,
+                 scrolldown_func=None):
+        self.text = text
+        self.static = QtGui.QStaticText(text)
+        self.static.setTextFormat(QtCore.Qt.PlainText)
+        self.x = self.width = 0
+        self.color = color and QtGui.QColor(color)
+        self.background = background and QtGui.QColor(background)
+        self.padding = padding
+        self.radius = radius
+        self.value = value
+        self.bar = None
+        self.click_func = click_func
+        self.hover_func = hover_func
+        self.doubleclick_func = doubleclick_func
+        self.scrollup_func = scrollup_func
+        self.scrolldown_func = scrolldown_func
+        self.source = None
+        self.source_args = None
+        if cmd is not None or func is not None or source is not None:
+            self.source_args = (
+                cmd, func, update_period, update_proc, post_proc_func,
+                stream, triggers, source, scheduler, bus, adaptive,
+                executor, timeout)
+
+    def start(self, bar):
+        self.bar = bar
+        if self.source_args is not None:
+            self.start_source(*self.source_args)
+
+    def stop(self):
+        if self.source_args is not None:
+            super().stop()
+
+    def queue_update(self, value):
+        self.record_queue_delay()
+        self.bar.queue_item(self, value)
+
+    def set_text(self, text):
+        '''
+        Returns True when the new text needs a different width
+        '''
+        if text == self.text:
+            return False
+        self.text = text
+        self.static.setText(text)
+        return self.measure() != self.width
+
+    def measure(self):
+        return round(self.static.size().width()) + 2 * self.padding
+
+    def contains(self, x):
+        return self.x <= x < self.x + self.width
+
+
+class PaintedBar(Bar):
+    '''
+    Bar taking PaintedText items, 'Stretch' and 'Spacing N' instead of
+    widgets. An update repaints only the rectangle of its item, unless
+    its width changed and the items after it have to move.
+    '''
+    def initProps(self):
+        self.set_window_flags()
+        self.setMouseTracking(True)
+        self.items = [i for i in self.wdgts if isinstance(i, PaintedText)]
+        self.pending = {}
+        self.hovered = None
+        self.profile_name = type(self).__name__
+        self.stylize()
+        self.inforce_bar_height()
+        for item in self.items:
+            item.start(self)
+
+    def stylize(self):
+        props = self.props
+        weight = QtGui.QFont.Bold if props.font_weight == 'bold' \
+            else QtGui.QFont.Normal
+        self.item_font = QtGui.QFont(
+            props.font_family.strip('"\''), int(props.font_size), weight)
+        self.color = QtGui.QColor(getattr(props, 'color', 'white'))
+        self.background = QtGui.QColor(props.background)
+        self.radius = int(str(props.rounded_corner).rstrip('px') or 0)
+        for item in self.items:
+            item.static.prepare(font=self.item_font)
+        self.relayout()
+
+    def inforce_bar_height(self):
+        self.setGeometry(
+            self.props.x, self.props.y, self.props.width, self.props.height)
+        self.setFixedHeight(self.props.height)
+        self.relayout()
+
+    def set_widgets(self, wdgts):
+        self.stop_sources()
+        self.wdgts = wdgts
+        self.items = [i for i in wdgts if isinstance(i, PaintedText)]
+        for item in self.items:
+            item.static.prepare(font=self.item_font)
+            item.start(self)
+        self.relayout()
+
+    def stop_sources(self):
+        for item in self.items:
+            item.stop()
+
+    def relayout(self):
+        '''
+        Place the items, stretches share the width left
+        '''
+        spacing = self.props.widgets_spacing
+        fixed = 0
+        for entry in self.wdgts:
+            if isinstance(entry, PaintedText):
+                entry.width = entry.measure()
+                fixed += entry.width + spacing
+            elif entry.startswith('Spacing'):
+                fixed += int(entry.split(maxsplit=1)[1])
+        stretches = self.wdgts.count('Stretch')
+        stretch = max(self.width() - fixed, 0) / stretches if stretches else 0
+        x = 0
+        for entry in self.wdgts:
+            if isinstance(entry, PaintedText):
+                entry.x = round(x)
+                x += entry.width + spacing
+            elif entry == 'Stretch':
+                x += stretch
+            elif entry.startswith('Spacing'):
+                x += int(entry.split(maxsplit=1)[1])
+        self.update()
+
+    def queue_item(self, item, value):
+        '''
+        Hold value until the compositor's next frame
+        '''
+        self.pending[item] = value
+        default_compositor().post(self, None)
+
+    def update_widget(self, _):
+        pending, self.pending = self.pending, {}
+        moved = False
+        dirty = []
+        for item, value in pending.items():
+            if item.bar is not self:
+                continue
+            # a new width moves the items after it
+            moved |= item.set_text(item.value(value))
+            dirty.append(QtCore.QRect(item.x, 0, item.width, self.height()))
+        if moved:
+            self.relayout()
+            return
+        for rect in dirty:
+            self.update(rect)
+
+    def resizeEvent(self, ev):
+        self.relayout()
+        super().resizeEvent(ev)
+
+    def paintEvent(self, ev):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setFont(self.item_font)
+        painter.setPen(QtCore.Qt.NoPen)
+        height = self.height()
+        if self.background.alpha():
+            painter.setBrush(self.background)
+            painter.drawRoundedRect(
+                QtCore.QRectF(self.rect()), self.radius, self.radius)
+        region = ev.rect()
+        for item in self.items:
+            if item.x + item.width < region.left() or item.x > region.right():
+                continue
+            if item.background is not None:
+                painter.setPen(QtCore.Qt.NoPen)
+                painter.setBrush(item.background)
+                painter.drawRoundedRect(
+                    QtCore.QRectF(item.x, 0, item.width, height),
+                    item.radius, item.radius)
+            painter.setPen(item.color or self.color)
+            size = item.static.size()
+            painter.drawStaticText(QtCore.QPointF(
+                item.x + item.padding, (height - size.height()) / 2),
+                item.static)
+        painter.end()
+
+    def item_at(self, pos):
+        for item in self.items:
+            if item.contains(pos.x()):
+                return item
+
+    def call(self, pos, callback):
+        item = self.item_at(pos)
+        func = item and getattr(item, callback)
+        if func is not None:
+            func()
+
+    def mouseReleaseEvent(self, ev):
+        self.call(ev.pos(), 'click_func')
+
+    def mouseDoubleClickEvent(self, ev):
+        self.call(ev.pos(), 'doubleclick_func')
+
+    def wheelEvent(self, ev):
+        self.call(ev.pos(), 'scrolldown_func' if ev.angleDelta().y() < 0
+                  else 'scrollup_func')
+
+    def mouseMoveEvent(self, ev):
+        item = self.item_at(ev.pos())
+        if item is not self.hovered:
+            self.hovered = item
+            if item is not None and item.hover_func is not None:
+                item.hover_func()
+
+    def leaveEvent(self, ev):
+        self.hovered = None
+        super().leaveEvent(ev)
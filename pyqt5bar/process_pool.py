@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+'''
+Worker processes for CPU heavy python sources, so parsing a large page
+never holds the GIL the GUI thread needs
+'''
+
+import sys
+import atexit
+import threading
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# ProcessPoolExecutor replaces its own workers from python 3.11 on
+POOL_RECYCLES_WORKERS = sys.version_info >= (3, 11)
+
+
+def warm(modules):
+    for module in modules:
+        importlib.import_module(module)
+
+
+class SourceProcessPool:
+    '''
+    Shared pool of worker processes started from a forkserver that has
+    the modules of the sources already imported, only the result of a
+    call is sent back. Workers are replaced after max_tasks_per_child
+    calls (the whole pool after that many calls per worker before
+    python 3.11), and the whole pool when a call runs past its timeout.
+    '''
+    def __init__(self, max_workers=2, max_tasks_per_child=50,
+                 method='forkserver'):
+        self.max_workers = max_workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.method = method
+        self.modules = set()
+        self.executor = None
+        self.calls = 0
+        self.lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def preload(self, func):
+        '''
+        Import the module of func in the forkserver, effective for the
+        sources known when the first worker starts
+        '''
+        module = getattr(func, '__module__', None)
+        if module and module != '__main__':
+            self.modules.add(module)
+
+    def start(self):
+        context = multiprocessing.get_context(self.method)
+        if self.method == 'forkserver':
+            context.set_forkserver_preload(sorted(self.modules))
+        options = {}
+        if POOL_RECYCLES_WORKERS:
+            options['max_tasks_per_child'] = self.max_tasks_per_child
+        executor = ProcessPoolExecutor(
+            self.max_workers, mp_context=context, **options)
+        # start every worker now rather than on the first slow call
+        for _ in range(self.max_workers):
+            executor.submit(warm, sorted(self.modules))
+        return executor
+
+    def call(self, func, timeout=None):
+        '''
+        Result of func() run in a worker, TimeoutError when it takes
+        longer than timeout seconds
+        '''
+        with self.lock:
+            if self.executor is None:
+                self.executor = self.start()
+                self.calls = 0
+            executor = self.executor
+            self.calls += 1
+            retire = not POOL_RECYCLES_WORKERS and \
+                self.calls >= self.max_workers * self.max_tasks_per_child
+            if retire:
+                self.executor = None
+        try:
+            future = executor.submit(func)
+            if retire:
+                # workers exit once the calls already submitted are done
+                executor.shutdown(wait=False)
+            return future.result(timeout)
+        except (TimeoutError, BrokenProcessPool):
+            self.recycle(executor)
+            raise
+
+    def recycle(self, executor):
+        '''
+        Replace a pool whose worker is stuck or died, the other calls
+        running on it fail and run again on their next update
+        '''
+        with self.lock:
+            if self.executor is not executor:
+                return
+            self.executor = None
+        self.kill(executor)
+        print('Source process pool recycled', file=sys.stderr)
+
+    def kill(self, executor):
+        # workers can't be interrupted, only killed
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            self.kill(executor)
+
+
+_pool = None
+
+
+def default_process_pool():
+    '''
+    Pool shared by every source run with executor='process'
+    '''
+    global _pool
+    if _pool is None:
+        _pool = SourceProcessPool()
+    return _pool
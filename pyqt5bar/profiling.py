@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+'''
+Opt in per source statistics, every hook returns right away unless
+profiling was enabled with enable_profiling
+'''
+
+import os
+import json
+import time
+import atexit
+import socket
+import threading
+from PyQt5 import QtCore, QtWidgets
+
+# times of a source, in the order they happen
+METRICS = ('fetch', 'post_proc', 'queue_delay', 'render')
+COUNTERS = ('updates', 'errors', 'spawns')
+
+
+class Histogram:
+    '''
+    Power of two buckets of microseconds, bucket i counts durations
+    below 2**i µs
+    '''
+    def __init__(self, buckets=32):
+        self.counts = [0] * buckets
+        self.total = 0
+        self.sum = 0.0
+
+    def add(self, seconds):
+        micros = int(seconds * 1e6)
+        self.counts[min(micros.bit_length(), len(self.counts) - 1)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def percentile(self, p):
+        '''
+        Upper bound in seconds of the bucket holding the p percentile
+        '''
+        if not self.total:
+            return 0
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= p / 100 * self.total:
+                return 2 ** i / 1e6
+        return 2 ** len(self.counts) / 1e6
+
+    def summary(self):
+        return {
+            'count': self.total,
+            'mean_ms': round(self.sum / self.total * 1000, 3)
+            if self.total else 0,
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3)}
+
+
+class SourceStats:
+    def __init__(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histograms = {metric: Histogram() for metric in METRICS}
+
+    def summary(self):
+        return {
+            **self.counters,
+            **{metric: histogram.summary()
+               for metric, histogram in self.histograms.items()}}
+
+    def tooltip(self):
+        lines = [f'{k}: {v}' for k, v in self.counters.items()]
+        for metric, histogram in self.histograms.items():
+            summary = histogram.summary()
+            lines.append(
+                f'{metric}: {summary["mean_ms"]} ms mean, '
+                f'{summary["p99_ms"]} ms p99')
+        return '\n'.join(lines)
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.tracing = False
+        self.trace_path = None
+        self.stats = {}
+        self.events = []
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+
+    def source_stats(self, name):
+        if name not in self.stats:
+            self.stats[name] = SourceStats()
+        return self.stats[name]
+
+    def record(self, name, metric, start, end=None):
+        '''
+        Add the duration since start to metric of source name
+        '''
+        if not self.enabled:
+            return
+        end = time.perf_counter() if end is None else end
+        with self.lock:
+            self.source_stats(name).histograms[metric].add(end - start)
+            if self.tracing:
+                self.events.append({
+                    'name': name, 'cat': metric, 'ph': 'X',
+                    'ts': round((start - self.start) * 1e6),
+                    'dur': round((end - start) * 1e6),
+                    'pid': os.getpid(), 'tid': threading.get_ident()})
+
+    def count(self, name, counter):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.source_stats(name).counters[counter] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def write_trace(self, path):
+        '''
+        Save the recorded events in Chrome trace format, open the file
+        with chrome://tracing or Perfetto
+        '''
+        with self.lock:
+            events = list(self.events)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def finish(self):
+        '''
+        Write the trace asked for by enable_profiling, once
+        '''
+        path, self.trace_path = self.trace_path, None
+        if path is not None:
+            self.write_trace(path)
+
+
+profiler = Profiler()
+
+
+def source_name(cmd=None, func=None):
+    '''
+    Readable name of a source for the stats
+    '''
+    if cmd is not None:
+        return cmd if isinstance(cmd, str) else ' '.join(cmd)
+    return getattr(func, '__qualname__', repr(func))
+
+
+class StatsServer:
+    '''
+    Unix socket answering every connection with the stats as JSON
+    '''
+    def __init__(self, path):
+        self.path = path
+        if self.in_use():
+            raise OSError(f'Another bar serves stats on {path}')
+        if os.path.exists(path):
+            # a socket left behind by a bar that crashed
+            os.unlink(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen()
+        self.thread = threading.Thread(
+            target=self.serve, name='pyqt5bar-stats', daemon=True)
+        self.thread.start()
+
+    def in_use(self):
+        '''
+        True when something answers on the socket path
+        '''
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.settimeout(0.2)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                return False
+        return True
+
+    def serve(self):
+        while True:
+            conn, _ = self.sock.accept()
+            try:
+                with conn:
+                    conn.sendall(json.dumps(profiler.snapshot()).encode())
+            except OSError:
+                # client went away mid-answer, keep serving the others
+                pass
+
+
+class StatsOverlay(QtCore.QObject):
+    '''
+    Shows the stats of every updating widget of window in its tooltip
+    '''
+    def __init__(self, window, interval=2000):
+        super().__init__(window)
+        self.window = window
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(interval)
+
+    def refresh(self):
+        for widget in self.window.findChildren(QtWidgets.QWidget):
+            name = getattr(widget, 'profile_name', None)
+            if name is not None and name in profiler.stats:
+                widget.setToolTip(f'{name}\n{profiler.stats[name].tooltip()}')
+
+
+def default_socket_path():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR', '/tmp')
+    return os.path.join(runtime_dir, 'pyqt5bar-stats.sock')
+
+
+def enable_profiling(trace_path=None, socket_path=None):
+    '''
+    Start collecting stats, trace_path gets a Chrome trace when the
+    process exits and socket_path serves the stats as JSON
+    '''
+    profiler.enabled = True
+    if trace_path is not None:
+        profiler.tracing = True
+        profiler.trace_path = trace_path
+        atexit.register(profiler.finish)
+    if socket_path is not None:
+        return StatsServer(socket_path)
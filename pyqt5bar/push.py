@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+'''
+Client of the bar's IPC socket, see pyqt5bar.ipc. Kept free of Qt so
+hooks calling it start fast.
+
+    python -m pyqt5bar.push mail --text 3 --state unread
+    tail -f log | python -m pyqt5bar.push log --stdin
+'''
+
+import os
+import sys
+import json
+import socket
+import argparse
+from itertools import chain
+
+HEADER = 4
+
+
+def default_socket_path():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR', '/tmp')
+    return os.path.join(runtime_dir, 'pyqt5bar.sock')
+
+
+def encode(message):
+    '''
+    message as JSON behind its length
+    '''
+    data = json.dumps(message).encode()
+    return len(data).to_bytes(HEADER, 'big') + data
+
+
+def send(messages, path=None):
+    '''
+    Send messages over a single connection to the bar at path
+    '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path or default_socket_path())
+        for message in messages:
+            sock.sendall(encode(message))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Push an update to a named bar widget')
+    parser.add_argument('widget')
+    parser.add_argument('-t', '--text')
+    parser.add_argument('-s', '--state')
+    parser.add_argument('-i', '--icon')
+    parser.add_argument(
+        '--stdin', action='store_true',
+        help='send every line read from stdin as the text')
+    parser.add_argument('--socket', default=default_socket_path())
+    args = parser.parse_args()
+
+    message = {'widget': args.widget}
+    for field in ('text', 'state'):
+        if getattr(args, field) is not None:
+            message[field] = getattr(args, field)
+    if args.icon is not None:
+        # the bar doesn't share our working directory
+        message['icon'] = os.path.abspath(args.icon) if args.icon else ''
+    messages = [message] if len(message) > 1 else []
+    if args.stdin:
+        # one connection for the whole stream, lines are sent as read
+        messages = chain(messages, (
+            {'widget': args.widget, 'text': line.rstrip('\n')}
+            for line in sys.stdin))
+    send(messages, args.socket)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+
+import heapq
+import itertools
+import os
+import sys
+import selectors
+import threading
+import time
+import traceback
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from pyqt5bar import metrics
+from pyqt5bar.profiling import profiler
+from pyqt5bar.triggers import UeventTrigger
+
+
+class AdaptivePolicy:
+    '''
+    Stretches the period of a source by backoff every time its value
+    comes out unchanged, up to max_factor times the period, and snaps
+    back as soon as the value changes
+    '''
+    def __init__(self, backoff=2, max_factor=8):
+        self.backoff = backoff
+        self.max_factor = max_factor
+        self.factor = 1
+
+    def next_period(self, period, changed):
+        if changed:
+            self.factor = 1
+        else:
+            self.factor = min(self.factor * self.backoff, self.max_factor)
+        return period * self.factor
+
+
+class LowPowerMonitor:
+    '''
+    Job switching its scheduler to the low power profile while the
+    machine runs on battery
+    '''
+    update_period = 300
+
+    def __init__(self, scheduler, factor):
+        self.scheduler = scheduler
+        self.factor = factor
+        self.name = 'low power monitor'
+        self.triggers = [UeventTrigger('power_supply')]
+
+    def watched_files(self):
+        return self.triggers
+
+    def file_ready(self, trigger):
+        return trigger.fire()
+
+    def stop(self):
+        for trigger in self.triggers:
+            trigger.close()
+
+    def run_once(self):
+        battery = metrics.battery()
+        on_battery = battery is not None and battery[1] == 'Discharging'
+        self.scheduler.set_power_factor(self.factor if on_battery else 1)
+
+
+class TriggerRestart:
+    '''
+    One off job starting an exited trigger again and handing it back to
+    the job it belongs to
+    '''
+    update_period = 0
+
+    def __init__(self, scheduler, job, trigger):
+        self.scheduler = scheduler
+        self.job = job
+        self.trigger = trigger
+        self.name = f'restart {getattr(job, "name", repr(job))} trigger'
+
+    def watched_files(self):
+        return []
+
+    def run_once(self):
+        if self.job in self.scheduler.jobs and self.trigger.restart():
+            if not self.scheduler.watch(self.job, self.trigger):
+                # the job stopped while the command was starting
+                self.trigger.close()
+
+
+class UpdateScheduler:
+    '''
+    Central scheduler for widget sources, a priority queue of due times
+    feeding a bounded pool of worker threads.
+
+    max_workers: size of the worker pool shared by all sources
+    slack      : jobs due within this many seconds of each other are
+                 run in the same wakeup
+    stagger    : seconds between the first runs of jobs registered
+                 together, so a starting bar doesn't fork everything at once
+
+    A job may carry a policy (see AdaptivePolicy) and a changed flag
+    telling if its last run produced a new value.
+    '''
+    def __init__(self, max_workers=4, slack=0.05, stagger=0.05):
+        self.slack = slack
+        self.stagger = stagger
+        self.next_start = 0
+        self.paused = False
+        self.power_factor = 1
+        self.power_monitor = None
+        self.listeners = []
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='pyqt5bar-worker')
+        self.selector = selectors.DefaultSelector()
+        self.queue = []
+        self.jobs = {}
+        self.running = set()
+        self.rerun = set()
+        # start time of the running jobs, for the watchdog
+        self.started = {}
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+        # self pipe used to wake the scheduler thread on changes
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+
+        self.thread = threading.Thread(
+            target=self.loop, name='pyqt5bar-scheduler', daemon=True)
+        self.thread.start()
+
+    def wake(self):
+        try:
+            os.write(self.wake_w, b'\0')
+        except BlockingIOError:
+            pass
+
+    def register(self, job, delay=0):
+        '''
+        Add a job, it will be run after delay seconds then every
+        job.update_period seconds (never again when that is 0), and
+        early whenever one of the files returned by job.watched_files()
+        becomes readable, job.file_ready(fileobj) decides if it should
+        run and raises EOFError once the file is exhausted
+        '''
+        with self.lock:
+            if job in self.jobs:
+                return
+            now = time.monotonic()
+            self.next_start = max(self.next_start, now)
+            delay += self.next_start - now
+            self.next_start += self.stagger
+            self.jobs[job] = now + delay
+            heapq.heappush(
+                self.queue, (self.jobs[job], next(self.counter), job))
+            for fileobj in job.watched_files():
+                self.selector.register(fileobj, selectors.EVENT_READ, job)
+        self.wake()
+
+    def unregister(self, job):
+        with self.lock:
+            # event only jobs are parked as None, they still watch files
+            if job not in self.jobs:
+                return
+            del self.jobs[job]
+            self.unwatch(job)
+        self.wake()
+
+    def watch(self, job, fileobj):
+        '''
+        Start watching a file job opened after it was registered,
+        False when job isn't registered anymore
+        '''
+        with self.lock:
+            if job not in self.jobs:
+                return False
+            self.selector.register(fileobj, selectors.EVENT_READ, job)
+        self.wake()
+        return True
+
+    def unwatch(self, job):
+        for fileobj in job.watched_files():
+            try:
+                self.selector.unregister(fileobj)
+            except (KeyError, ValueError):
+                pass
+
+    def reschedule(self, job, delay):
+        '''
+        Move the next run of job to delay seconds from now
+        '''
+        with self.lock:
+            if job not in self.jobs:
+                return
+            self.jobs[job] = time.monotonic() + delay
+            heapq.heappush(
+                self.queue, (self.jobs[job], next(self.counter), job))
+        self.wake()
+
+    def submit(self, job):
+        '''
+        Hand job to the worker pool, a job that is already running is
+        run again as soon as it finishes
+        '''
+        with self.lock:
+            if job not in self.jobs:
+                return
+            if job in self.running:
+                self.rerun.add(job)
+                return
+            self.running.add(job)
+        try:
+            self.pool.submit(self.run_job, job)
+        except RuntimeError:
+            # the pool refuses work once the interpreter is exiting
+            with self.lock:
+                self.running.discard(job)
+            raise SystemExit
+
+    def run_job(self, job):
+        with self.lock:
+            self.started[job] = time.monotonic()
+        try:
+            job.run_once()
+        except CancelledError:
+            # stopped by restart or shutdown, there is no value
+            pass
+        except (TimeoutError, FuturesTimeoutError) as e:
+            # a slow source is expected, a line is enough
+            name = getattr(job, 'name', repr(job))
+            print(str(e) or f'{name} timed out', file=sys.stderr)
+            profiler.count(name, 'errors')
+        except Exception:
+            traceback.print_exc()
+            profiler.count(getattr(job, 'name', repr(job)), 'errors')
+        finally:
+            with self.lock:
+                self.started.pop(job, None)
+                self.running.discard(job)
+                if job not in self.jobs:
+                    return
+                if job in self.rerun:
+                    self.rerun.discard(job)
+                    delay = 0
+                elif job.update_period == 0:
+                    # event driven only, or done when nothing can trigger
+                    self.jobs[job] = None
+                    if not job.watched_files():
+                        self.jobs.pop(job)
+                    return
+                else:
+                    delay = self.period(job)
+                self.jobs[job] = time.monotonic() + delay
+                heapq.heappush(
+                    self.queue, (self.jobs[job], next(self.counter), job))
+            self.wake()
+
+    def restart(self, job):
+        '''
+        Cancel a stuck run of job and run it again. A run that can't be
+        cancelled, like a python function in a thread, keeps its worker
+        and isn't given another one, returns False then
+        '''
+        with self.lock:
+            if job not in self.running or job not in self.jobs:
+                return False
+            self.rerun.add(job)
+        if hasattr(job, 'cancel') and job.cancel():
+            return True
+        with self.lock:
+            self.rerun.discard(job)
+        return False
+
+    def shutdown(self, timeout=2):
+        '''
+        Stop every job and wait at most timeout seconds for the running
+        ones, returns False when some are still stuck
+        '''
+        with self.lock:
+            jobs = set(self.jobs) | self.running
+            self.jobs.clear()
+            self.queue.clear()
+            for job in jobs:
+                self.unwatch(job)
+        for job in jobs:
+            for method in ('cancel', 'stop'):
+                if hasattr(job, method):
+                    getattr(job, method)()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        deadline = time.monotonic() + timeout
+        while self.started and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return not self.started
+
+    def period(self, job):
+        period = job.update_period
+        policy = getattr(job, 'policy', None)
+        if policy is not None:
+            period = policy.next_period(period, getattr(job, 'changed', True))
+        return period * self.power_factor
+
+    def add_listener(self, callback):
+        '''
+        Call callback() whenever the scheduler is paused, resumed or its
+        power factor changes, so timers outside of it can follow. It is
+        called from the thread making the change.
+        '''
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify(self):
+        for callback in list(self.listeners):
+            try:
+                callback()
+            except RuntimeError:
+                # the Qt object behind callback is gone
+                self.remove_listener(callback)
+
+    def set_power_factor(self, factor):
+        if factor == self.power_factor:
+            return
+        self.power_factor = factor
+        self.notify()
+
+    def pause(self):
+        '''
+        Suspend every job, triggers are still drained but ignored
+        '''
+        if self.paused:
+            return
+        self.paused = True
+        self.wake()
+        self.notify()
+
+    def resume(self):
+        '''
+        Run every job right away and continue as usual
+        '''
+        if not self.paused:
+            return
+        with self.lock:
+            self.paused = False
+            now = time.monotonic()
+            for job in self.jobs:
+                self.jobs[job] = now
+                heapq.heappush(self.queue, (now, next(self.counter), job))
+        self.wake()
+        self.notify()
+
+    def follow_power_supply(self, factor=3):
+        '''
+        Multiply all periods by factor while running on battery
+        '''
+        if self.power_monitor is None:
+            self.power_monitor = LowPowerMonitor(self, factor)
+            self.register(self.power_monitor)
+        self.power_monitor.factor = factor
+
+    def pop_due(self):
+        '''
+        Pop every job due now or within the slack window, returns the
+        due jobs and the timeout until the next one
+        '''
+        due = []
+        with self.lock:
+            now = time.monotonic()
+            while self.queue:
+                when, _, job = self.queue[0]
+                if self.jobs.get(job) != when:
+                    # stale entry, job was rescheduled or removed
+                    heapq.heappop(self.queue)
+                    continue
+                if when > now + self.slack:
+                    return due, when - now
+                heapq.heappop(self.queue)
+                due.append(job)
+        return due, None
+
+    def loop(self):
+        while True:
+            if self.paused:
+                due, timeout = [], None
+            else:
+                due, timeout = self.pop_due()
+            for job in due:
+                self.submit(job)
+            for key, _ in self.selector.select(timeout):
+                if key.data is None:
+                    try:
+                        os.read(self.wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                try:
+                    ready = key.data.file_ready(key.fileobj)
+                except EOFError:
+                    # writer went away, stop watching to avoid spinning
+                    with self.lock:
+                        try:
+                            self.selector.unregister(key.fileobj)
+                        except KeyError:
+                            pass
+                    if hasattr(key.fileobj, 'restart'):
+                        self.register(
+                            TriggerRestart(self, key.data, key.fileobj),
+                            key.fileobj.backoff)
+                    continue
+                if ready and not self.paused:
+                    self.submit(key.data)
+
+
+_scheduler = None
+
+
+def default_scheduler():
+    '''
+    Scheduler shared by all widgets of the process
+    '''
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = UpdateScheduler()
+    return _scheduler
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+import time
+
+# taken when the widget modules are first imported
+START = time.perf_counter()
+
+
+class StartupReport:
+    '''
+    Times of the startup milestones and of the first value shown by
+    every source, relative to the first import of pyqt5bar
+    '''
+    def __init__(self):
+        self.marks = {}
+        self.first_updates = {}
+
+    def mark(self, event):
+        self.marks.setdefault(event, time.perf_counter() - START)
+
+    def first_update(self, name):
+        if name not in self.first_updates:
+            self.first_updates[name] = time.perf_counter() - START
+
+    def report(self):
+        lines = ['startup timings (ms since import):']
+        for event, elapsed in self.marks.items():
+            lines.append(f'  {elapsed * 1000:8.1f}  {event}')
+        for name, elapsed in sorted(
+                self.first_updates.items(), key=lambda item: item[1]):
+            lines.append(f'  {elapsed * 1000:8.1f}  first value of {name}')
+        return '\n'.join(lines)
+
+
+startup = StartupReport()
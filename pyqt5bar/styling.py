@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _compile(items):
+    return ' '.join(f'{k.replace("_", "-")}: {v};' for k, v in items)
+
+
+def compile_props(props):
+    '''
+    Turn a props dict into stylesheet declarations, compiled once per
+    distinct dict content
+    '''
+    return _compile(tuple(props.items()))
+
+
+@lru_cache(maxsize=None)
+def _compile_states(prop, states, selector):
+    return ' '.join(
+        f'{selector}[{prop}="{state}"] {{ {_compile(items)} }}'
+        for state, items in states)
+
+
+def state_stylesheet(prop, states, selector='QLabel'):
+    '''
+    One stylesheet holding a rule per state, states maps a value of
+    the dynamic property prop to a props dict
+    '''
+    return _compile_states(
+        prop, tuple((k, tuple(v.items())) for k, v in states.items()),
+        selector)
+
+
+def apply_stylesheet(widget, stylesheet):
+    '''
+    Set stylesheet unless the widget already has it, every call to
+    setStyleSheet re-parses and re-polishes
+    '''
+    if widget.styleSheet() != stylesheet:
+        widget.setStyleSheet(stylesheet)
+
+
+def set_state(widget, prop, value):
+    '''
+    Flip a dynamic property used by a state_stylesheet and re-polish
+    only the widget, does nothing when the value didn't change
+    '''
+    if widget.property(prop) == value:
+        return
+    widget.setProperty(prop, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
+    widget.update()
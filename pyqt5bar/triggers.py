@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+'''
+Event sources that make a widget update right away instead of waiting
+for its next period, each trigger is a file the scheduler selects on
+'''
+
+import os
+import re
+import glob
+import ctypes
+import signal
+import socket
+import subprocess
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+NETLINK_KOBJECT_UEVENT = 15
+
+
+def kill_group(proc, sig=signal.SIGKILL):
+    '''
+    Signal proc and everything it started, commands run in their own
+    session so shell pipelines go too
+    '''
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+class Trigger:
+    '''
+    Base trigger, subclasses provide fileno and fire, fire is called by
+    the scheduler when the file is readable and returns True if the
+    widget should update, it raises EOFError once the source is gone.
+    close is called when the source owning the trigger stops.
+    '''
+    def __new__(cls, *args, **kwargs):
+        trigger = super().__new__(cls)
+        # what the trigger was made from, configs compare triggers by it
+        trigger.spec = (args, kwargs)
+        return trigger
+
+    def fileno(self):
+        raise NotImplementedError
+
+    def fire(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def renew(self):
+        '''
+        A new trigger made the same way, for a source starting again
+        after this one was closed
+        '''
+        args, kwargs = self.spec
+        return type(self)(*args, **kwargs)
+
+
+def renew_all(triggers):
+    return [trigger.renew() for trigger in triggers]
+
+
+class FdTrigger(Trigger):
+    '''
+    Fires whenever fileobj is readable, read is called to consume the
+    pending data and defaults to draining the descriptor
+    '''
+    def __init__(self, fileobj, read=None):
+        self.fileobj = fileobj
+        self.read = read
+
+    def fileno(self):
+        if isinstance(self.fileobj, int):
+            return self.fileobj
+        return self.fileobj.fileno()
+
+    def fire(self):
+        if self.read is not None:
+            self.read()
+            return True
+        try:
+            if not os.read(self.fileno(), 65536):
+                raise EOFError
+        except BlockingIOError:
+            pass
+        return True
+
+
+class InotifyTrigger(Trigger):
+    '''
+    Fires on changes of files or directories, paths may be globs
+    '''
+    def __init__(self, paths, mask=IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE
+                 | IN_MOVED_TO | IN_CREATE | IN_DELETE):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if isinstance(paths, str):
+            paths = [paths]
+        for pattern in paths:
+            for path in glob.glob(pattern):
+                libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+
+    def fileno(self):
+        return self.fd
+
+    def fire(self):
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class UeventTrigger(Trigger):
+    '''
+    Fires on kernel uevents (what udev listens to) of the given
+    subsystems, e.g. 'power_supply' when the charger is plugged in
+    '''
+    def __init__(self, subsystems, actions=None):
+        if isinstance(subsystems, str):
+            subsystems = [subsystems]
+        self.subsystems = set(subsystems)
+        self.actions = set(actions) if actions is not None else None
+        self.sock = socket.socket(
+            socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        self.sock.setblocking(False)
+        self.sock.bind((0, 1))
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def matches(self, message):
+        fields = dict(
+            field.split('=', 1) for field in
+            message.decode(errors='replace').split('\0') if '=' in field)
+        if fields.get('SUBSYSTEM') not in self.subsystems:
+            return False
+        return self.actions is None or fields.get('ACTION') in self.actions
+
+    def fire(self):
+        fired = False
+        while True:
+            try:
+                message = self.sock.recv(65536)
+            except BlockingIOError:
+                return fired
+            fired = self.matches(message) or fired
+
+    def close(self):
+        self.sock.close()
+
+
+class CommandTrigger(Trigger):
+    '''
+    Runs a long lived command and fires when it prints a line matching
+    pattern (any line when pattern is None), e.g. 'pactl subscribe'.
+    An exited command is reaped and restarted by the scheduler after
+    backoff seconds, doubling up to max_restart_delay until it prints
+    again.
+    '''
+    def __init__(self, cmd, pattern=None, restart_delay=1,
+                 max_restart_delay=60):
+        self.cmd = cmd
+        self.pattern = re.compile(pattern) if pattern is not None else None
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.backoff = restart_delay
+        self.closed = False
+        self.start()
+
+    def start(self):
+        # own session, so closing also ends what a shell started
+        self.proc = subprocess.Popen(
+            self.cmd, shell=isinstance(self.cmd, str),
+            stdout=subprocess.PIPE, stdin=subprocess.DEVNULL,
+            start_new_session=True)
+        os.set_blocking(self.proc.stdout.fileno(), False)
+        self.buffer = b''
+
+    def fileno(self):
+        return self.proc.stdout.fileno()
+
+    def fire(self):
+        try:
+            data = os.read(self.fileno(), 65536)
+        except BlockingIOError:
+            return False
+        if not data:
+            self.reap()
+            raise EOFError
+        *lines, self.buffer = (self.buffer + data).split(b'\n')
+        if lines:
+            self.backoff = self.restart_delay
+        if self.pattern is None:
+            return bool(lines)
+        return any(self.pattern.search(line.decode(errors='replace'))
+                   for line in lines)
+
+    def restart(self):
+        '''
+        Start the command again, False once the trigger is closed
+        '''
+        if self.closed:
+            return False
+        self.start()
+        self.backoff = min(self.backoff * 2, self.max_restart_delay)
+        return True
+
+    def reap(self):
+        '''
+        End the command and its children and collect its exit status
+        '''
+        if self.proc.poll() is None:
+            kill_group(self.proc, signal.SIGTERM)
+            try:
+                self.proc.wait(1)
+            except subprocess.TimeoutExpired:
+                kill_group(self.proc)
+                self.proc.wait()
+        self.proc.stdout.close()
+
+    def close(self):
+        self.closed = True
+        self.reap()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import weakref
+from PyQt5 import QtCore, QtWidgets, sip
+
+from pyqt5bar.scheduler import default_scheduler
+from pyqt5bar.styling import set_state
+
+
+class Watchdog(QtCore.QObject):
+    '''
+    Looks after the sources every interval seconds. A run lasting longer
+    than its source's timeout, or stuck_after seconds, is cancelled and
+    started again. Runs that can't be cancelled are reported once and
+    left to finish. Widgets whose source gave no value for stale_after
+    periods are dimmed and get the dynamic property stale="true" for
+    stylesheets. It sleeps while the scheduler is paused.
+    '''
+    scheduler_changed = QtCore.pyqtSignal()
+
+    def __init__(self, scheduler=None, interval=5, stale_after=3,
+                 stuck_after=60, stale_opacity=0.5):
+        super().__init__()
+        self.scheduler = scheduler or default_scheduler()
+        self.stale_after = stale_after
+        self.stuck_after = stuck_after
+        self.stale_opacity = stale_opacity
+        self.interval = interval
+        self.widgets = weakref.WeakSet()
+        # stuck runs already reported, by start time
+        self.reported = {}
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.check)
+        self.scheduler_changed.connect(self.follow_scheduler)
+        self.scheduler.add_listener(self.scheduler_changed.emit)
+        self.follow_scheduler()
+
+    def follow_scheduler(self):
+        if self.scheduler.paused:
+            self.timer.stop()
+        else:
+            self.timer.start(int(self.interval * 1000))
+
+    def watch(self, widget):
+        self.widgets.add(widget)
+
+    def check(self):
+        now = time.monotonic()
+        started = dict(self.scheduler.started)
+        for job, start in started.items():
+            limit = getattr(job, 'timeout', None) or self.stuck_after
+            if now - start <= limit or self.reported.get(job) == start:
+                continue
+            name = getattr(job, 'name', repr(job))
+            if self.scheduler.restart(job):
+                print(f'{name} stuck for {now - start:.0f}s, restarted',
+                      file=sys.stderr)
+                continue
+            print(f"{name} stuck for {now - start:.0f}s and can't be "
+                  'cancelled, waiting for it', file=sys.stderr)
+            self.reported[job] = start
+        for job in set(self.reported) - set(started):
+            del self.reported[job]
+        for widget in list(self.widgets):
+            if sip.isdeleted(widget):
+                self.widgets.discard(widget)
+                continue
+            self.mark(widget, self.is_stale(widget.func_obj, now))
+
+    def is_stale(self, job, now):
+        if self.scheduler.paused or not hasattr(job, 'last_run'):
+            return False
+        period = job.update_period * self.scheduler.power_factor
+        if not period:
+            # event driven, nothing says when to expect a value
+            return False
+        policy = getattr(job, 'policy', None)
+        period *= getattr(policy, 'max_factor', 1)
+        return now - job.last_run > self.stale_after * period
+
+    def mark(self, widget, stale):
+        state = 'true' if stale else 'false'
+        if (widget.property('stale') or 'false') == state:
+            return
+        set_state(widget, 'stale', state)
+        if stale:
+            effect = QtWidgets.QGraphicsOpacityEffect(widget)
+            effect.setOpacity(self.stale_opacity)
+            widget.setGraphicsEffect(effect)
+        else:
+            widget.setGraphicsEffect(None)
+
+
+_watchdog = None
+
+
+def default_watchdog():
+    '''
+    Watchdog of the default scheduler, created on first use from the
+    GUI thread
+    '''
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = Watchdog()
+    return _watchdog
@@ -1,12 +1,28 @@
 #!/usr/bin/env python
 
+import os
 import time
-import select
+import signal
+import inspect
 import subprocess
+from concurrent.futures import CancelledError
 from PyQt5 import QtCore, QtWidgets, Qt
 
+from pyqt5bar.async_sources import AsyncFuncObject, AsyncStreamObject
+from pyqt5bar.bus import default_bus
+from pyqt5bar.cache import last_value
+from pyqt5bar.compositor import default_compositor
+from pyqt5bar.process_pool import default_process_pool
+from pyqt5bar.profiling import profiler, source_name
+from pyqt5bar.scheduler import default_scheduler, AdaptivePolicy
+from pyqt5bar.styling import apply_stylesheet, compile_props
+from pyqt5bar.triggers import CommandTrigger, kill_group
+from pyqt5bar.watchdog import default_watchdog
+
 
 default_style = {'background': 'transparent', 'padding': '0px', 'margin': '0px'}
+# seconds a command source may run unless given its own timeout
+COMMAND_TIMEOUT = 30
 
 
 class LabelWithSignals(QtWidgets.QLabel):
@@ -53,11 +69,7 @@ class GroupWidget(QtWidgets.QFrame):
         self.stylize()
 
     def stylize(self):
-        stylesheet = " ".join(
-            f'{k.replace("_", "-")}: {v};'
-            for k, v in self.props.items())
-        self.setStyleSheet(stylesheet)
-        # self.setProperty('group_frame', True)
+        apply_stylesheet(self, compile_props(self.props))
 
 
 class BaseWidget(QtWidgets.QWidget):
@@ -75,16 +87,27 @@ class BaseWidget(QtWidgets.QWidget):
         '''
         Apply user settings
         '''
-        stylesheet = " ".join(f'{k.replace("_", "-")}: {v};'
-                              for k, v in self.props.items())
-        self.setStyleSheet(stylesheet)
+        apply_stylesheet(self, compile_props(self.props))
 
 
 class TextWidget(BaseWidget):
+    '''
+    stable_width: keep the width of the widest text seen lately, so
+                  changing text repaints only this widget instead of
+                  moving the rest of the bar. True, or a template string
+                  like '00:00' giving the smallest width to keep
+    width_decay : seconds before shrinking to narrower text again
+    '''
     def __init__(self, text, click_func=None, hover_func=None,
                  doubleclick_func=None, scrollup_func=None,
-                 scrolldown_func=None, **kwargs):
+                 scrolldown_func=None, stable_width=None, width_decay=300,
+                 **kwargs):
         super().__init__(**kwargs)
+        self.stable_width = stable_width
+        self.width_decay = width_decay
+        self.reserved_width = 0
+        self.reserved_at = 0
+        self.reserved_font = None
         self.click_func = click_func
         self.hover_func = hover_func
         self.doubleclick_func = doubleclick_func
@@ -97,6 +120,49 @@ class TextWidget(BaseWidget):
         self.hbox.addWidget(self.label)
         self.connect_signals()
 
+    def showEvent(self, ev):
+        self.reserve_width(self.label.text())
+        super().showEvent(ev)
+
+    def set_text(self, text):
+        if self.label.text() == text:
+            return
+        self.reserve_width(text)
+        self.label.setText(text)
+
+    def reserve_width(self, text):
+        '''
+        Pin the label to the widest text seen in the last width_decay
+        seconds, or to the template when wider
+        '''
+        if not self.stable_width:
+            return
+        self.label.ensurePolished()
+        font = self.label.font()
+        metrics = self.label.fontMetrics()
+        if font != self.reserved_font:
+            # the bar's stylesheet applies once the widget is in the bar
+            self.reserved_font = font
+            self.reserved_width = 0
+            self.label.setMinimumWidth(0)
+            self.label.setMaximumWidth(QtWidgets.QWIDGETSIZE_MAX)
+            # padding, frame and indent of the label around the text
+            self.text_margin = self.label.sizeHint().width() \
+                - metrics.horizontalAdvance(self.label.text())
+        width = metrics.horizontalAdvance(text)
+        if isinstance(self.stable_width, str):
+            width = max(width, metrics.horizontalAdvance(self.stable_width))
+        now = time.monotonic()
+        if width >= self.reserved_width:
+            self.reserved_at = now
+        elif now - self.reserved_at < self.width_decay:
+            return
+        if width == self.reserved_width:
+            return
+        self.reserved_width = width
+        self.reserved_at = now
+        self.label.setFixedWidth(width + self.text_margin)
+
     def connect_signals(self):
         if self.click_func is not None:
             self.label.clicked.connect(self.click_func)
@@ -112,12 +178,13 @@ class TextWidget(BaseWidget):
 
 class SubProcessObject(QtCore.QObject):
     '''
-    Object for running subprocess and waiting for results
-    to be moved into a thread object
+    Object for running subprocess and waiting for results,
+    scheduled by an UpdateScheduler
     '''
     update_signal = QtCore.pyqtSignal(object)
 
-    def __init__(self, cmd, func, update_period, update_proc, post_proc_func):
+    def __init__(self, cmd, func, update_period, update_proc, post_proc_func,
+                 triggers=(), executor=None, timeout=None):
         super().__init__()
         if cmd is None and func is None:
             raise ValueError('You have to either pass a function or a command')
@@ -129,102 +196,346 @@ class SubProcessObject(QtCore.QObject):
         self.update_period = update_period
         self.post_proc_func = post_proc_func
         self.update_proc = update_proc
-        self.start_updater_proc()
+        self.name = source_name(cmd, func)
+        self.changed = True
+        self.last_out = None
+        self.emitted_at = 0
+        self.triggers = list(triggers)
+        if update_proc is not None:
+            self.triggers.append(CommandTrigger(update_proc))
+        # something with call(func, timeout), func runs here when None
+        self.executor = executor
+        self.timeout = timeout
+        self.process = None
+        # end of the last run, for the watchdog
+        self.last_run = time.monotonic()
+        if executor is not None and func is not None:
+            executor.preload(func)
+
+    def watched_files(self):
+        '''
+        Triggers the scheduler should watch for early updates
+        '''
+        return self.triggers
+
+    def file_ready(self, trigger):
+        '''
+        return early if a trigger fired
+        '''
+        return trigger.fire()
 
-    def start_updater_proc(self):
-        if self.update_proc is None:
+    def initial_value(self):
+        '''
+        Last persisted value of a cached func, shown until the first run
+        '''
+        out = last_value(self.func)
+        if out is not None and self.post_proc_func is not None:
+            out = self.post_proc_func(out)
+        self.last_out = out
+        return out
+
+    def run_once(self):
+        start = time.perf_counter()
+        if self.cmd is not None:
+            profiler.count(self.name, 'spawns')
+            out = self.run_command()
+        if self.func is not None:
+            out = self.func() if self.executor is None \
+                else self.executor.call(self.func, self.timeout)
+        fetched = time.perf_counter()
+        profiler.record(self.name, 'fetch', start, fetched)
+        if self.post_proc_func is not None:
+            out = self.post_proc_func(out)
+            profiler.record(self.name, 'post_proc', fetched)
+        self.last_run = time.monotonic()
+        # unchanged values never cross to the GUI thread
+        self.changed = out != self.last_out
+        if not self.changed:
             return
-        self.update_p = subprocess.Popen(
-            self.update_proc, text=True, shell=True,
-            stdout=subprocess.PIPE)
-    
-    def wait_updater(self):
-        '''
-        return early if updater produced something
-        '''
-        ready, _, _ = select.select(
-            [self.update_p.stdout], [], [], self.update_period)
-        if ready:
-            _ = ready[0].readline()
-            return True
-        return False
+        self.last_out = out
+        self.emitted_at = time.perf_counter()
+        self.update_signal.emit(out)
+
+    def run_command(self):
+        '''
+        stdout of cmd, killed with its children past the timeout
+        '''
+        timeout = self.timeout or COMMAND_TIMEOUT
+        # communicate reads while waiting, a full pipe can't block it
+        process = self.process = subprocess.Popen(
+            self.cmd, text=True, shell=isinstance(self.cmd, str),
+            stdout=subprocess.PIPE, stdin=subprocess.DEVNULL,
+            start_new_session=True)
+        process.cancelled = False
+        try:
+            out, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_group(process)
+            process.communicate()
+            raise TimeoutError(
+                f'{self.name} took longer than {timeout}s') from None
+        finally:
+            self.process = None
+        if process.cancelled:
+            # whatever it printed before being killed isn't a value
+            raise CancelledError
+        return out
+
+    def cancel(self):
+        '''
+        Kill the running command so the run ends right away without a
+        value, False when there is nothing to kill
+        '''
+        process = self.process
+        if process is None:
+            return False
+        process.cancelled = True
+        kill_group(process)
+        return True
+
+    def stop(self):
+        '''
+        End the running command and the processes and files of the
+        triggers, for good
+        '''
+        self.cancel()
+        for trigger in self.triggers:
+            trigger.close()
+
 
-    def start_process(self):
-        while True:
-            if self.cmd is not None:
-                try:
-                    P = subprocess.Popen(
-                        self.cmd, text=True, shell=True,
-                        stdout=subprocess.PIPE)
-                    P.wait()
-                    out = P.stdout.read()
-                except subprocess.CalledProcessError:
-                    out = ''
-            if self.func is not None:
-                out = self.func()
+class StreamProcessObject(QtCore.QObject):
+    '''
+    Runs a long lived command and emits every record it writes,
+    the command is restarted with an exponential backoff when it exits
+
+    cmd              : shell string or argv list
+    post_proc_func   : called on each record, runs in the scheduler thread
+                       so it should be cheap
+    delimiter        : record separator
+    restart_delay    : initial delay before restarting an exited command
+    max_restart_delay: upper bound for the backoff
+    '''
+    update_signal = QtCore.pyqtSignal(object)
+
+    def __init__(self, cmd, post_proc_func=None, delimiter='\n',
+                 restart_delay=1, max_restart_delay=60, scheduler=None):
+        super().__init__()
+        self.cmd = cmd
+        self.post_proc_func = post_proc_func
+        self.delimiter = delimiter.encode()
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.backoff = restart_delay
+        self.scheduler = scheduler or default_scheduler()
+        self.name = source_name(cmd)
+        self.proc = None
+        self.buffer = b''
+        self.last_out = None
+        self.emitted_at = 0
+
+    @property
+    def update_period(self):
+        # liveness check while running, backoff once the command exited
+        if self.running():
+            return self.max_restart_delay
+        return self.backoff
+
+    def running(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def watched_files(self):
+        if self.running():
+            return [self.proc.stdout]
+        return []
+
+    def run_once(self):
+        if self.running():
+            return
+        if self.proc is not None:
+            self.backoff = min(self.backoff * 2, self.max_restart_delay)
+        self.buffer = b''
+        profiler.count(self.name, 'spawns')
+        self.proc = subprocess.Popen(
+            self.cmd, shell=isinstance(self.cmd, str),
+            stdout=subprocess.PIPE, stdin=subprocess.DEVNULL,
+            start_new_session=True)
+        os.set_blocking(self.proc.stdout.fileno(), False)
+        self.scheduler.watch(self, self.proc.stdout)
+
+    def file_ready(self, fileobj):
+        try:
+            data = os.read(fileobj.fileno(), 65536)
+        except BlockingIOError:
+            return False
+        if not data:
+            fileobj.close()
+            self.scheduler.reschedule(self, self.backoff)
+            raise EOFError
+        *records, self.buffer = (self.buffer + data).split(self.delimiter)
+        for record in records:
+            self.backoff = self.restart_delay
+            out = record.decode(errors='replace')
             if self.post_proc_func is not None:
+                start = time.perf_counter()
                 out = self.post_proc_func(out)
-            self.update_signal.emit(out)
-            if self.update_period == 0:
-                break
-            if self.update_proc is not None:
-                self.wait_updater()
-            else:
-                time.sleep(self.update_period)
+                profiler.record(self.name, 'post_proc', start)
+            if out != self.last_out:
+                self.last_out = out
+                self.emitted_at = time.perf_counter()
+                self.update_signal.emit(out)
+        return False
+
+    def stop(self):
+        if self.running():
+            kill_group(self.proc, signal.SIGTERM)
 
 
-class CommandInThread(QtCore.QThread):
+def source_object(cmd, func, update_period, update_proc, post_proc_func,
+                  stream, scheduler, triggers=(), adaptive=False,
+                  executor=None, timeout=None):
     '''
-    A QThread for running subprocesses and waiting for results
-    override start method for running your own functions
+    Build the object feeding a self updating widget, async def and
+    async generator functions run on the shared asyncio loop
     '''
-    def __init__(self, func_obj):
-        super().__init__()
-        self.func_obj = func_obj
+    if executor == 'process':
+        executor = default_process_pool()
+    elif executor == 'thread':
+        executor = None
+    func_obj = make_source_object(
+        cmd, func, update_period, update_proc, post_proc_func, stream,
+        scheduler, triggers, executor, timeout)
+    if adaptive:
+        func_obj.policy = AdaptivePolicy() if adaptive is True else adaptive
+    return func_obj
+
+
+def make_source_object(cmd, func, update_period, update_proc, post_proc_func,
+                       stream, scheduler, triggers, executor, timeout):
+    if cmd is not None and func is not None:
+        raise ValueError(
+            'You cannot pass a function and a command at the same time')
+    if inspect.isasyncgenfunction(func):
+        return AsyncStreamObject(
+            func, update_period, post_proc_func, triggers=triggers)
+    if inspect.iscoroutinefunction(func):
+        return AsyncFuncObject(
+            func, update_period, post_proc_func, triggers=triggers,
+            timeout=timeout)
+    if stream:
+        if cmd is None:
+            raise ValueError('A streaming source needs a command')
+        return StreamProcessObject(
+            cmd, post_proc_func, scheduler=scheduler,
+            **({} if stream is True else stream))
+    return SubProcessObject(
+        cmd, func, update_period, update_proc, post_proc_func, triggers,
+        executor, timeout)
+
+
+class SourceMixin:
+    '''
+    Feeds update_widget from a command, a function or a named source of
+    the data bus
+    '''
+    # painted items use it with __slots__
+    __slots__ = ()
+
+    def start_source(self, cmd, func, update_period, update_proc,
+                     post_proc_func, stream, triggers, source, scheduler,
+                     bus, adaptive=False, executor=None, timeout=None):
+        self.scheduler = scheduler or default_scheduler()
+        self.source = source
+        if source is not None:
+            self.bus = bus or default_bus()
+            self.profile_name = source
+            self.func_obj = self.bus.subscribe(source, self.queue_update)
+            if isinstance(self, QtWidgets.QWidget):
+                default_watchdog().watch(self)
+            return
+        self.func_obj = source_object(
+            cmd, func, update_period, update_proc, post_proc_func, stream,
+            self.scheduler, triggers, adaptive, executor, timeout)
+        self.profile_name = self.func_obj.name
+        if isinstance(self, QtWidgets.QWidget):
+            default_watchdog().watch(self)
+        self.func_obj.update_signal.connect(self.queue_update)
+        if hasattr(self.func_obj, 'initial_value'):
+            value = self.func_obj.initial_value()
+            if value is not None:
+                self.queue_update(value)
+        self.scheduler.register(self.func_obj)
+
+    def queue_update(self, value):
+        '''
+        Hand value to the compositor, update_widget runs with the other
+        updates of the same frame
+        '''
+        self.record_queue_delay()
+        default_compositor().post(self, value)
 
-    def start(self):
-        self.func_obj.moveToThread(self)
-        self.started.connect(self.func_obj.start)
-        super().start()
+    def record_queue_delay(self):
+        if not profiler.enabled:
+            return
+        # the bus replays its last value before func_obj is assigned,
+        # and initial values were never emitted
+        func_obj = getattr(self, 'func_obj', None)
+        emitted_at = getattr(func_obj, 'emitted_at', 0)
+        if emitted_at:
+            profiler.record(self.profile_name, 'queue_delay', emitted_at)
+
+    def stop(self):
+        '''
+        Stop receiving updates, the source stops unless it is shared
+        '''
+        if self.source is not None:
+            self.bus.unsubscribe(self.source, self.queue_update)
+            return
+        self.scheduler.unregister(self.func_obj)
+        if hasattr(self.func_obj, 'stop'):
+            self.func_obj.stop()
 
 
-class SelfUpdatingWidget(TextWidget):
+class SelfUpdatingWidget(SourceMixin, TextWidget):
     def __init__(
             self, inittext='', cmd=None, func=None, update_period=0,
-            update_proc=None, post_proc_func=None, **kwargs):
+            update_proc=None, post_proc_func=None, stream=False,
+            triggers=(), source=None, adaptive=False, executor=None,
+            timeout=None, scheduler=None, bus=None, **kwargs):
+        '''
+        stream  : run cmd once and update on every line it prints, a dict
+                  is passed to StreamProcessObject as options
+        triggers: pyqt5bar.triggers objects that make the widget update
+                  right away
+        source  : name of a data bus source to show instead of cmd/func
+        adaptive: back off while the value doesn't change, True or an
+                  AdaptivePolicy
+        executor: 'process' runs func in the shared process pool, for
+                  CPU heavy functions that would make the bar stutter
+        timeout : seconds a run may take, commands are killed after
+                  COMMAND_TIMEOUT by default, functions only time out
+                  in the process pool or when async
+        '''
         super().__init__(inittext, **kwargs)
         self.current_text = inittext
-
-        self.func_obj = SubProcessObject(
-            cmd, func, update_period, update_proc, post_proc_func)
-
-        self.thread = QtCore.QThread()
-        self.func_obj.moveToThread(self.thread)
-        self.func_obj.update_signal.connect(self.update_widget)
-        self.thread.started.connect(self.func_obj.start_process)
-        self.thread.start()
+        self.start_source(
+            cmd, func, update_period, update_proc, post_proc_func, stream,
+            triggers, source, scheduler, bus, adaptive, executor, timeout)
 
     def update_widget(self, text):
-        if self.label.text() == text:
-            return
-        self.label.setText(text)
+        self.set_text(text)
 
 
-class SelfUpdatingWidgets(GroupWidget):
+class SelfUpdatingWidgets(SourceMixin, GroupWidget):
     def __init__(
             self, wdgts, cmd=None, func=None, update_period=0,
-            update_proc=None, post_proc_func=None, **kwargs):
+            update_proc=None, post_proc_func=None, stream=False,
+            triggers=(), source=None, adaptive=False, executor=None,
+            timeout=None, scheduler=None, bus=None, **kwargs):
         super().__init__(wdgts, **kwargs)
-
-        self.func_obj = SubProcessObject(
-            cmd, func, update_period, update_proc, post_proc_func)
-
-        self.thread = QtCore.QThread()
-        self.func_obj.moveToThread(self.thread)
-        self.func_obj.update_signal.connect(self.update_widget)
-        self.thread.started.connect(self.func_obj.start_process)
-        self.thread.start()
         self.widgets = wdgts
+        self.start_source(
+            cmd, func, update_period, update_proc, post_proc_func, stream,
+            triggers, source, scheduler, bus, adaptive, executor, timeout)
 
     def update_widgets(self, output:list):
         '''
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+'''
+HttpFetcher against a local stand-in server
+'''
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pyqt5bar.http_source import HttpFetcher, jsonpath
+
+PAGE = json.dumps({'services': [
+    {'name': 'web', 'state': 'up'}, {'name': 'db', 'state': 'down'}]})
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(
+            (self.client_address, self.headers.get('If-None-Match')))
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = PAGE.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpFetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/status'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_not_modified_reuses_value(self):
+        fetcher = HttpFetcher(self.url, jsonpath='$.services[*].state')
+        self.assertEqual(fetcher(), ['up', 'down'])
+        self.assertEqual(fetcher(), ['up', 'down'])
+        validators = [etag for _, etag in self.server.requests]
+        self.assertEqual(validators, [None, ETAG])
+
+    def test_connection_is_reused(self):
+        fetcher = HttpFetcher(self.url)
+        for _ in range(3):
+            fetcher()
+        clients = {client for client, _ in self.server.requests}
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(clients), 1)
+
+    def test_failure_keeps_last_value(self):
+        fetcher = HttpFetcher(self.url, jsonpath='$.services[0].name')
+        self.assertEqual(fetcher(), ['web'])
+        fetcher.url = self.url.replace(
+            str(self.server.server_port), '1')
+        self.assertEqual(fetcher(), ['web'])
+
+
+class JsonPathTest(unittest.TestCase):
+    def test_paths(self):
+        data = json.loads(PAGE)
+        self.assertEqual(jsonpath(data, '$.services[1].name'), ['db'])
+        self.assertEqual(jsonpath(data, "$.services[*]['state']"),
+                         ['up', 'down'])
+        self.assertEqual(jsonpath(data, '$.missing'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()